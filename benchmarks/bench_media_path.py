@@ -0,0 +1,100 @@
+import os
+import sys
+import time
+import random
+import pathlib
+import argparse
+from pathlib import Path
+
+# Allow running as python3 benchmarks/bench_media_path.py from the project root
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from scripts import media_path
+
+def generate_paths(count, seed=0):
+    """
+    Build a synthetic library of TV episodes and movies without creating anything on disk
+    Args:
+        count (int): Number of paths to generate
+        seed (int): Random seed so runs are reproducible
+    Returns:
+        list: Path strings, roughly 80% TV episodes and 20% movies
+    """
+    rng = random.Random(seed)
+    root = '/media/source'
+    shows = [f"Show {i:04d}" for i in range(max(1, count // 200))]
+    paths = []
+
+    for i in range(count):
+        if rng.random() < 0.8:
+            show = rng.choice(shows)
+            season = rng.randint(1, 12)
+            episode = rng.randint(1, 24)
+            name = rng.choice([
+                f"S{season:02d}E{episode:02d}.mkv",
+                f"{show.replace(' ', '.')}.S{season:02d}E{episode:02d}.1080p.mkv",
+                f"{show.lower()} season {season} episode {episode}.mp4",
+            ])
+            paths.append(f"{root}/{show}/Season {season}/{name}")
+        else:
+            paths.append(f"{root}/Movie {i} ({rng.randint(1950, 2024)}).mp4")
+    return paths
+
+class NoDiskAccess:
+    """Context manager that makes any filesystem lookup during the benchmark fail loudly"""
+
+    PATCHED = [(os, 'stat'), (os, 'lstat'), (os, 'scandir'), (os, 'listdir'),
+               (pathlib.Path, 'glob'), (pathlib.Path, 'exists'), (pathlib.Path, 'is_dir')]
+
+    def __enter__(self):
+        self._saved = [(owner, name, getattr(owner, name)) for owner, name in self.PATCHED]
+        for owner, name in self.PATCHED:
+            setattr(owner, name, self._fail(name))
+        return self
+
+    def __exit__(self, *exc):
+        for owner, name, original in self._saved:
+            setattr(owner, name, original)
+
+    @staticmethod
+    def _fail(name):
+        def fail(*args, **kwargs):
+            raise AssertionError(f"media path parser touched the disk via {name}")
+        return fail
+
+def time_pass(func, paths):
+    """Return (seconds, matches) for one pass of func over paths"""
+    start = time.perf_counter()
+    matches = sum(1 for path in paths if func(path))
+    return time.perf_counter() - start, matches
+
+def run_benchmark(count, seed=0):
+    """Time cold and warm passes of both parsers over count synthetic paths"""
+    paths = generate_paths(count, seed)
+    results = {}
+
+    with NoDiskAccess():
+        for label, func in (('parse_tv_show', media_path.parse_tv_show),
+                            ('extract_tv_info', media_path.extract_tv_info)):
+            media_path.clear_caches()
+            cold, matches = time_pass(func, paths)
+            warm, _ = time_pass(func, paths)
+            results[label] = {
+                'paths': count,
+                'matches': matches,
+                'cold_seconds': round(cold, 4),
+                'warm_seconds': round(warm, 4),
+                'cold_us_per_path': round(cold / count * 1e6, 2),
+                'warm_us_per_path': round(warm / count * 1e6, 2),
+            }
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the media path parser on synthetic paths")
+    parser.add_argument('--count', type=int, default=100_000, help="Number of synthetic paths")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    for name, stats in run_benchmark(args.count, args.seed).items():
+        print(f"{name}: {stats['matches']}/{stats['paths']} matched, "
+              f"cold {stats['cold_seconds']}s ({stats['cold_us_per_path']} us/path), "
+              f"warm {stats['warm_seconds']}s ({stats['warm_us_per_path']} us/path)")
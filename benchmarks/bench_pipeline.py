@@ -0,0 +1,294 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import argparse
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+# Allow running as python3 benchmarks/bench_pipeline.py from the project root
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from scripts import scan, media_path, handbrake, video_test, audio_test, qc, mover
+from bench_media_path import generate_paths
+
+STAGES = ('scan', 'parse', 'transcode', 'video_check', 'audio_check', 'qc', 'move')
+# A stage is flagged when its median time grows by more than this fraction of the baseline
+DEFAULT_THRESHOLD = 0.10
+
+# Reproducible clips: (name, seconds, size, black span in seconds or None, silent audio)
+MEDIA_SPECS = (
+    ('short_720p', 10, '1280x720', None, False),
+    ('black_720p', 30, '1280x720', (10, 14), False),
+    ('silent_480p', 20, '854x480', None, True),
+    ('long_1080p', 120, '1920x1080', None, False),
+)
+MOVE_FILE_MB = 256
+
+def generate_clip(output_path, seconds, size, black=None, silent=False):
+    """
+    Render a test clip from ffmpeg lavfi sources; bit-exact so every run gets the same file
+    Args:
+        output_path (str): .mkv to write
+        seconds (int): Clip length
+        size (str): Frame size, e.g. '1280x720'
+        black (tuple): (start, end) seconds painted black, or None
+        silent (bool): Use anullsrc instead of a sine tone
+    """
+    audio = (f'anullsrc=channel_layout=stereo:sample_rate=48000:duration={seconds}' if silent
+             else f'sine=frequency=440:sample_rate=48000:duration={seconds}')
+    cmd = [
+        'ffmpeg', '-nostats', '-y',
+        '-f', 'lavfi', '-i', f'testsrc2=size={size}:rate=24:duration={seconds}',
+        '-f', 'lavfi', '-i', audio,
+    ]
+    if black:
+        cmd.extend(['-vf', f"drawbox=color=black:t=fill:enable='between(t,{black[0]},{black[1]})'"])
+    # Built-in encoders only, so any ffmpeg build can produce the media
+    cmd.extend(['-c:v', 'mpeg4', '-q:v', '4', '-c:a', 'aac', '-shortest',
+                '-fflags', '+bitexact', '-map_metadata', '-1', str(output_path)])
+    subprocess.run(cmd, capture_output=True, check=True)
+
+def generate_media(media_dir):
+    """Create any missing test clips in media_dir and return their paths"""
+    media_dir = Path(media_dir)
+    media_dir.mkdir(parents=True, exist_ok=True)
+    clips = []
+    for name, seconds, size, black, silent in MEDIA_SPECS:
+        clip_path = media_dir / f"{name}.mkv"
+        if not clip_path.exists():
+            logging.info(f"Generating {clip_path}")
+            generate_clip(clip_path, seconds, size, black, silent)
+        clips.append(clip_path)
+    return clips
+
+def generate_tree(root, count, seed=0):
+    """Create a synthetic source tree of empty media files laid out like a real download folder"""
+    root = Path(root)
+    for path in generate_paths(count, seed):
+        file_path = root / Path(path).relative_to('/media/source')
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.touch()
+    return root
+
+def measure(func, repeat, reset=None):
+    """Run func repeat times and summarise the wall times; reset runs untimed after each run"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+        if reset:
+            reset()
+    return {
+        'runs': repeat,
+        'median_seconds': round(statistics.median(times), 6),
+        'min_seconds': round(min(times), 6),
+        'max_seconds': round(max(times), 6),
+    }
+
+def bench_scan(work_dir, tree_files, seed, repeat):
+    tree = generate_tree(work_dir / 'tree', tree_files, seed)
+    index = scan.ScanIndex(str(work_dir / 'scan_index.db'))
+    try:
+        list(scan.iter_media_files(tree, index, full_rescan=True))
+        return {
+            'full': dict(measure(lambda: list(scan.iter_media_files(tree)), repeat), files=tree_files),
+            'indexed': dict(measure(lambda: list(scan.iter_media_files(tree, index)), repeat), files=tree_files),
+        }
+    finally:
+        index.close()
+
+def bench_parse(tree_files, seed, repeat):
+    paths = generate_paths(tree_files, seed)
+
+    def parse_all():
+        media_path.clear_caches()
+        for path in paths:
+            media_path.parse_tv_show(path)
+
+    return {'cold': dict(measure(parse_all, repeat), paths=tree_files)}
+
+def bench_per_clip(clips, func, repeat):
+    """Time func on every clip; keyed by clip name, with the per-clip results kept for sanity"""
+    results = {}
+    for clip in clips:
+        outcome = []
+        stats = measure(lambda: outcome.append(func(clip)), repeat)
+        stats['result'] = repr(outcome[-1])
+        results[clip.stem] = stats
+    return results
+
+def bench_transcode(clips, work_dir, repeat):
+    output_dir = work_dir / 'transcoded'
+    output_dir.mkdir(exist_ok=True)
+    # Transcode the shortest clip only; a full encode of every clip takes too long to repeat
+    clip = clips[0]
+    output = output_dir / clip.name
+    return {clip.stem: measure(lambda: handbrake.transcode_video(str(clip), str(output), echo_output=False), repeat)}
+
+def bench_move(work_dir, repeat, move_target=None):
+    """Time moving a large file within work_dir and, if given, onto another filesystem"""
+    source = work_dir / 'move_source.bin'
+    with open(source, 'wb') as f:
+        for _ in range(MOVE_FILE_MB):
+            f.write(os.urandom(1024 * 1024))
+
+    results = {}
+    targets = [('same_device', work_dir / 'moved')]
+    if move_target:
+        targets.append(('cross_device', Path(move_target)))
+    for label, target_dir in targets:
+        target_dir.mkdir(parents=True, exist_ok=True)
+        dest = target_dir / 'move_dest.bin'
+        stats = measure(lambda: mover.move_file(source, dest), repeat,
+                        reset=lambda: shutil.move(str(dest), str(source)))
+        results[label] = dict(stats, bytes=MOVE_FILE_MB * 1024 * 1024)
+    source.unlink()
+    return results
+
+def tool_version(tool):
+    try:
+        result = subprocess.run([tool, '-version'], capture_output=True, text=True)
+        return result.stdout.splitlines()[0] if result.stdout else None
+    except OSError:
+        return None
+
+def run_benchmarks(stages, work_dir, tree_files=20_000, seed=0, repeat=3, move_target=None):
+    """
+    Run the selected stage benchmarks
+    Args:
+        stages (iterable): Names from STAGES
+        work_dir (Path): Scratch directory for generated media and trees
+        tree_files (int): Files in the synthetic source tree
+        seed (int): Random seed for the tree layout
+        repeat (int): Timed runs per measurement
+        move_target (str): Directory on another filesystem for cross-device moves
+    Returns:
+        dict: {'meta': ..., 'results': {stage: {case: stats}}, 'skipped': {stage: reason}}
+    """
+    work_dir = Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    has_ffmpeg = shutil.which('ffmpeg') and shutil.which('ffprobe')
+    needs_media = {'transcode', 'video_check', 'audio_check', 'qc'}
+    clips = generate_media(work_dir / 'media') if has_ffmpeg and needs_media & set(stages) else []
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'ffmpeg': tool_version('ffmpeg'),
+            'seed': seed,
+            'repeat': repeat,
+            'tree_files': tree_files,
+        },
+        'results': {},
+        'skipped': {},
+    }
+    results, skipped = report['results'], report['skipped']
+
+    for stage in stages:
+        if stage in needs_media and not has_ffmpeg:
+            skipped[stage] = 'ffmpeg/ffprobe not found'
+            continue
+        if stage == 'transcode' and not shutil.which('HandBrakeCLI'):
+            skipped[stage] = 'HandBrakeCLI not found'
+            continue
+
+        logging.info(f"Benchmarking {stage}")
+        if stage == 'scan':
+            results[stage] = bench_scan(work_dir, tree_files, seed, repeat)
+        elif stage == 'parse':
+            results[stage] = bench_parse(tree_files, seed, repeat)
+        elif stage == 'transcode':
+            results[stage] = bench_transcode(clips, work_dir, repeat)
+        elif stage == 'video_check':
+            results[stage] = bench_per_clip(clips, video_test.check_video_stream, repeat)
+        elif stage == 'audio_check':
+            results[stage] = bench_per_clip(clips, audio_test.get_average_volume, repeat)
+        elif stage == 'qc':
+            results[stage] = {}
+            for mode in ('full', 'sampled'):
+                check = lambda clip, mode=mode: qc.run_quality_checks(clip, mode=mode).passed
+                for name, stats in bench_per_clip(clips, check, repeat).items():
+                    results[stage][f"{name}_{mode}"] = stats
+        elif stage == 'move':
+            results[stage] = bench_move(work_dir, repeat, move_target)
+
+    return report
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare median times against a baseline report
+    Returns: list of (stage, case, baseline_seconds, seconds, change) for every regression
+    """
+    regressions = []
+    for stage, cases in report['results'].items():
+        for case, stats in cases.items():
+            base_stats = baseline.get('results', {}).get(stage, {}).get(case)
+            if not base_stats or not base_stats.get('median_seconds'):
+                continue
+            before, after = base_stats['median_seconds'], stats['median_seconds']
+            change = after / before - 1
+            status = 'REGRESSION' if change > threshold else 'ok'
+            print(f"{status:>10}  {stage}/{case}: {before:.4f}s -> {after:.4f}s ({change:+.1%})")
+            if change > threshold:
+                regressions.append((stage, case, before, after, change))
+    return regressions
+
+def print_report(report):
+    for stage, cases in report['results'].items():
+        for case, stats in cases.items():
+            print(f"{stage}/{case}: median {stats['median_seconds']:.4f}s "
+                  f"(min {stats['min_seconds']:.4f}s, max {stats['max_seconds']:.4f}s)")
+    for stage, reason in report['skipped'].items():
+        print(f"{stage}: skipped ({reason})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark each pipeline stage on synthetic media")
+    parser.add_argument('--stages', default=','.join(STAGES),
+                        help=f"Comma-separated stages to run (default: all of {', '.join(STAGES)})")
+    parser.add_argument('--work-dir', help="Scratch directory, kept between runs to reuse media "
+                                           "(default: a temporary directory)")
+    parser.add_argument('--tree-files', type=int, default=20_000, help="Files in the synthetic source tree")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per measurement")
+    parser.add_argument('--move-target', help="Directory on another filesystem for cross-device moves")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    parser.add_argument('--baseline', help="Compare against a previously saved JSON file")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Slowdown fraction flagged as a regression (default: 0.10)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+
+    if args.work_dir:
+        report = run_benchmarks(stages, args.work_dir, args.tree_files, args.seed, args.repeat, args.move_target)
+    else:
+        with tempfile.TemporaryDirectory(prefix='tc_bench_') as work_dir:
+            report = run_benchmarks(stages, work_dir, args.tree_files, args.seed, args.repeat, args.move_target)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+            sys.exit(1)
@@ -1,16 +1,32 @@
 import os
-import shutil
+import argparse
 import logging
 from pathlib import Path
 import json
-import re
 import concurrent.futures
-import pickle
+import threading
+import signal
+import time
 from datetime import datetime
 import scripts.rename as rename
-import scripts.audio_test as audio_test
-import scripts.video_test as video_test
+import scripts.qc as qc
 import scripts.handbrake as handbrake
+import scripts.journal as journal
+import scripts.scan as scan
+import scripts.watch as watch
+import scripts.media_path as media_path
+import scripts.mover as mover
+import scripts.probe as probe
+import scripts.profiles as profiles
+import scripts.chunked as chunked
+import scripts.cluster as cluster
+import scripts.scheduler as scheduler
+import scripts.telemetry as telemetry
+import scripts.fidelity as fidelity
+import scripts.spans as spans
+import scripts.fingerprint as fingerprint
+import scripts.library as library
+import scripts.process as process
 
 def setup_logging():
     """Configure logging to both file and console with timestamp"""
@@ -25,7 +41,7 @@ def setup_logging():
     # Configure logging
     logging.basicConfig(
         level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
+        format='%(asctime)s - %(levelname)s - %(threadName)s - %(message)s',
         handlers=[
             logging.FileHandler(log_file),
             logging.StreamHandler()
@@ -35,60 +51,18 @@ def setup_logging():
     logging.info("=== Starting New Processing Session ===")
     logging.info(f"Log file: {log_file}")
 
-def load_progress():
-    """Load progress from checkpoint file"""
-    try:
-        with open('.progress.pkl', 'rb') as f:
-            return pickle.load(f)
-    except FileNotFoundError:
-        return set()
-
-def save_progress(processed_files):
-    """Save progress to checkpoint file"""
-    with open('.progress.pkl', 'wb') as f:
-        pickle.dump(processed_files, f)
+def open_journal(config):
+    """Open the job journal, importing the legacy .progress.pkl checkpoint on first use"""
+    job_journal = journal.JobJournal(config.get('journal_path', '.jobs.db'))
+    job_journal.migrate_pickle(config.get('legacy_progress_path', '.progress.pkl'))
+    return job_journal
 
 def parse_tv_show(file_path):
     """
     Parse TV show information from file path
     Returns: (show_title, season_num, episode_num) or None if not a TV show
     """
-    path = Path(file_path)
-    
-    # First, try to get show name from directory structure
-    show_name = None
-    season_num = None
-    
-    # Look for show name (parent of "Season X" directory)
-    for parent in path.parents:
-        if parent.name.lower().startswith('season '):
-            show_name = parent.parent.name
-            season_match = re.search(r'season\s*(\d+)', parent.name, re.IGNORECASE)
-            if season_match:
-                season_num = int(season_match.group(1))
-            break
-    
-    if not show_name or not season_num:
-        return None
-        
-    # Find episode number in filename
-    episode_patterns = [
-        r'[Ee](\d{1,2})',                # Matches "E1"
-        r'[Ss]\d{1,2}[Ee](\d{1,2})',     # Matches "S4E1"
-        r'episode\s*(\d{1,2})',          # Matches "episode 1"
-    ]
-    
-    episode_num = None
-    for pattern in episode_patterns:
-        match = re.search(pattern, path.name, re.IGNORECASE)
-        if match:
-            episode_num = int(match.group(1))
-            break
-    
-    if not episode_num:
-        return None
-        
-    return (show_name, season_num, episode_num)
+    return media_path.parse_tv_show(file_path)
 
 def create_tv_structure(base_path, show_title, season_num):
     """Create TV show directory structure"""
@@ -105,6 +79,7 @@ def cleanup_failed_file(file_path):
     except Exception as e:
         logging.error(f"Error cleaning up {file_path}: {e}")
 
+@spans.timed()
 def cleanup_source_file(file_path):
     """Remove original source file after successful processing"""
     try:
@@ -113,32 +88,43 @@ def cleanup_source_file(file_path):
     except Exception as e:
         logging.error(f"Error cleaning up source {file_path}: {e}")
 
-def move_to_final_destination(source_path, config):
+def get_destination_path(file_path, config):
+    """Work out where a processed file will live in the library"""
+    file_path = Path(file_path)
+    tv_info = parse_tv_show(file_path)
+
+    if tv_info:
+        # For TV shows: simplified episode filename SXXEXX.ext
+        show_title, season_num, episode_num = tv_info
+        episode_filename = f"S{season_num:02d}E{episode_num:02d}{file_path.suffix}"
+        return Path(config['tv_directory']) / show_title / f"Season {season_num}" / episode_filename
+
+    # For movies
+    return Path(config['movies_directory']) / file_path.name
+
+@spans.timed()
+def move_to_final_destination(source_path, config, dest_path=None):
     """Move processed file to its final destination"""
     try:
         source_path = Path(source_path)
+        dest_path = Path(dest_path) if dest_path else get_destination_path(source_path, config)
         tv_info = parse_tv_show(source_path)
         
         if tv_info:
-            # For TV shows
             show_title, season_num, episode_num = tv_info
-            dest_dir = create_tv_structure(config['tv_directory'], show_title, season_num)
-            
-            # Create simplified episode filename: SXXEXX.ext
-            episode_filename = f"S{season_num:02d}E{episode_num:02d}{source_path.suffix}"
-            dest_path = dest_dir / episode_filename
-            
             logging.info(f"TV Show detected: {show_title} - Season {season_num} Episode {episode_num}")
-        else:
-            # For movies
-            dest_dir = Path(config['movies_directory'])
-            dest_path = dest_dir / source_path.name
             
         # Create destination directory if it doesn't exist
-        os.makedirs(dest_dir, exist_ok=True)
+        os.makedirs(dest_path.parent, exist_ok=True)
         
-        # Move the file
-        shutil.move(str(source_path), str(dest_path))
+        # Move the file: atomic rename on one filesystem, in-kernel copy across filesystems
+        mover.move_file(
+            source_path,
+            dest_path,
+            reflink=config.get('move_reflink', True),
+            fsync=config.get('move_fsync', True),
+            verify_checksum=config.get('move_verify_checksum', False)
+        )
         logging.info(f"Moved {source_path.name} to {dest_path}")
         return True
         
@@ -146,125 +132,1010 @@ def move_to_final_destination(source_path, config):
         logging.error(f"Error moving file {source_path}: {e}")
         return False
 
-def test_transcoded_file(file_path):
+def get_transcode_path(source_path, config, tv_info=None, job_id=None):
+    """
+    Build the transcode output path for a source file, mirroring TV structure.
+    With job_id the name is unique to the job, so two sources with the same file name
+    (e.g. A/Film.mp4 and B/Film.mkv) never encode into the same file at once.
+    """
+    tv_info = tv_info or parse_tv_show(source_path)
+    output_name = source_path.name.replace(source_path.suffix, '.mkv')
+    if job_id is not None:
+        output_name = f"{source_path.stem}.job{job_id}.mkv"
+
+    if tv_info:
+        show_title, season_num, _ = tv_info
+        return create_tv_structure(
+            config['transcode_directory'],
+            show_title,
+            season_num
+        ) / output_name
+    return Path(config['transcode_directory']) / output_name
+
+def get_job_destination_path(job, config):
+    """Library path for a job's output, named after its source rather than its per-job transcode file"""
+    return get_destination_path(job.current_path.with_suffix(job.transcode_path.suffix), config)
+
+def get_transcode_workers(config):
+    """
+    Work out how many HandBrakeCLI jobs to run at once and how many threads each gets
+    Returns: (max_workers, threads_per_job) where threads_per_job is None for "all cores"
+    """
+    max_workers = max(1, int(config.get('max_parallel_transcodes', 1)))
+    threads = int(config.get('threads_per_transcode', 0))
+
+    if max_workers == 1 and not threads:
+        return max_workers, None
+
+    if not threads:
+        # Split the core budget evenly between concurrent jobs
+        threads = max(1, (os.cpu_count() or 1) // max_workers)
+
+    return max_workers, threads
+
+def get_preset_path(config):
+    """Base HandBrake preset file from config, relative paths resolved from the project root"""
+    preset_path = Path(config.get('preset', handbrake.DEFAULT_PRESET_PATH))
+    if not preset_path.is_absolute():
+        preset_path = Path(__file__).parent / preset_path
+    return preset_path
+
+def create_speed_planner(config):
+    """Speed planner choosing each file's encoder tier against encode_deadline_hours"""
+    config = dict(config)
+    if config.get('generated_preset_directory'):
+        config['generated_preset_directory'] = Path(__file__).parent / config['generated_preset_directory']
+    return profiles.create_planner(config, get_preset_path(config))
+
+def use_chunked_encode(config, media_info):
+    """Chunk only titles long enough for the split and join overhead to pay off"""
+    if not config.get('chunked_encode', False) or not media_info or not media_info.duration:
+        return False
+    return media_info.duration >= float(config.get('chunk_min_duration', 1800))
+
+@spans.timed()
+def transcode_file(source_path, config, threads=None, echo_output=True, tv_info=None, profile=None,
+                   media_info=None, transcode_path=None):
+    """
+    Transcode a single source file
+    Returns: (output path, encode stats dict), or (None, None) on failure
+    Raises: ProcessTimeout if the encoder was killed by its time limit or stall watchdog
+    """
+    transcode_path = transcode_path or get_transcode_path(source_path, config, tv_info)
+
+    logging.info(f"Transcoding: {source_path} -> {transcode_path}")
+    preset_path, preset_name = (profile.preset_file, profile.name) if profile else (get_preset_path(config), None)
+    if preset_name is None:
+        # No planner (e.g. a cluster worker): use the configured file's own preset, not the built-in name
+        try:
+            preset_name = profiles.load_base_preset(preset_path)[1]['PresetName']
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            logging.error(f"Could not read the preset name from {preset_path}: {e}")
+    if use_chunked_encode(config, media_info):
+        success = chunked.transcode_chunked(
+            str(source_path), str(transcode_path),
+            segments=int(config.get('chunk_segments', 4)),
+            workers=int(config.get('chunk_workers', 0)) or None,
+            threads=threads,
+            preset_path=preset_path,
+            preset_name=preset_name
+        )
+    else:
+        success = handbrake.transcode_video(str(source_path), str(transcode_path), threads, echo_output,
+                                            preset_path, preset_name,
+                                            duration=media_info.duration if media_info else None)
+    if success:
+        return transcode_path, success
+
+    logging.error(f"Failed to transcode: {source_path}")
+    return None, None
+
+@spans.timed()
+def test_transcoded_file(file_path, config=None):
     """Run comprehensive quality tests on transcoded file"""
+    config = config or {}
     try:
         # Check file exists and has size
         if not file_path.exists() or file_path.stat().st_size == 0:
             logging.error(f"File missing or empty: {file_path}")
             return False
             
-        # Check video stream
-        if not video_test.check_video_stream(str(file_path)):
-            logging.error(f"Video stream test failed: {file_path}")
+        # Check video stream, black frames and audio levels in one decode
+        report = qc.run_quality_checks(
+            file_path,
+            mode=config.get('qc_mode', 'full'),
+            sample_count=int(config.get('qc_sample_count', 8)),
+            sample_seconds=float(config.get('qc_sample_seconds', 20)),
+            full_on_sample_failure=config.get('qc_full_on_sample_failure', True)
+        )
+        if not report.passed:
+            logging.error(f"Quality tests failed for {file_path}: {', '.join(report.errors)}")
             return False
             
-        # Check audio levels
-        volume = audio_test.get_average_volume(str(file_path))
-        if volume is None or volume < -70:  # -70 dB threshold for silence
-            logging.error(f"Audio test failed: {file_path}")
-            return False
-            
-        logging.info(f"All quality tests passed: {file_path}")
+        logging.info(f"All quality tests passed: {file_path} "
+                     f"(mean volume {report.mean_volume:.1f} dB, "
+                     f"{report.black_sections} black section(s), "
+                     f"{report.mode} check in {report.elapsed:.1f}s)")
         return True
         
+    except process.ProcessKilled:
+        raise
     except Exception as e:
         logging.error(f"Error during quality testing: {e}")
         return False
 
-def process_all_files(config):
-    """Process all media files in stages"""
-    source_dir = Path(config['source_directory'])
-    processed_files = load_progress()
-    
-    # Get list of video files
-    video_files = [
-        f for f in source_dir.glob('**/*')
-        if f.suffix.lower() in ('.mp4', '.mkv', '.avi', '.mov')
-        and str(f) not in processed_files
-    ]
-    
-    if not video_files:
-        logging.info("No new files to process")
+@spans.timed()
+def test_fidelity(source_path, file_path, config):
+    """
+    Compare a transcode against its source with sampled SSIM/PSNR
+    Returns: False only if the file is below the floor and qc_fidelity_action is 'fail'
+    """
+    report = fidelity.run_fidelity_check(
+        source_path,
+        file_path,
+        sample_count=int(config.get('qc_fidelity_sample_count', 4)),
+        sample_seconds=float(config.get('qc_fidelity_sample_seconds', 5)),
+        min_ssim=float(config.get('qc_fidelity_min_ssim', fidelity.DEFAULT_MIN_SSIM)),
+        min_psnr=float(config.get('qc_fidelity_min_psnr', fidelity.DEFAULT_MIN_PSNR)),
+        analysis_width=int(config.get('qc_fidelity_analysis_width', fidelity.ANALYSIS_WIDTH))
+    )
+    if report.passed:
+        logging.info(f"Fidelity check passed: {file_path} (SSIM {report.ssim:.4f}, worst {report.worst_ssim:.4f}; "
+                     f"PSNR {report.psnr:.2f} dB, worst {report.worst_psnr:.2f} dB; "
+                     f"{report.windows} window(s) in {report.elapsed:.1f}s)")
+        return True
+
+    if config.get('qc_fidelity_action', 'fail') == 'flag':
+        logging.warning(f"Fidelity check flagged {file_path}: {', '.join(report.errors)}")
+        return True
+    logging.error(f"Fidelity check failed for {file_path}: {', '.join(report.errors)}")
+    return False
+
+@spans.timed()
+def rename_file(file_path):
+    """Rename a TV episode to SXXEXX in place, returning the (possibly unchanged) path"""
+    logging.info(f"Processing: {file_path}")
+    tv_info = parse_tv_show(file_path)
+
+    if tv_info:
+        show_title, season_num, episode_num = tv_info
+        new_filename = f"S{season_num:02d}E{episode_num:02d}{file_path.suffix}"
+        new_path = file_path.parent / new_filename
+        os.rename(file_path, new_path)
+        logging.info(f"Renamed to: {new_path}")
+        return new_path
+    return file_path
+
+def rename_job(job, job_journal):
+    """Stage 1 for one job, skipped when the journal shows it was already renamed"""
+    if not job.reached('renamed'):
+        with job.timed('rename'):
+            new_path = rename_file(job.current_path)
+        job_journal.advance(job, 'renamed', current_path=new_path)
+
+    job.tv_info = parse_tv_show(job.current_path)
+
+def analyze_job(job, config):
+    """
+    Probe a job's source and decide whether it needs a skip, a remux or a full transcode
+    Returns: 'skip', 'remux' or 'transcode'; 'timeout' or 'interrupted' if ffprobe was killed
+    """
+    if job.decision:
+        return job.decision
+
+    if not config.get('analyze_before_transcode', True):
+        job.decision = 'transcode'
+        return job.decision
+
+    with job.timed('analyze'):
+        try:
+            job.media_info = probe.probe_media(job.current_path)
+        except process.ProcessKilled as e:
+            # Not a decision to act on: transcode_job records it, and no planner counts it as an encode
+            job.decision = 'timeout' if isinstance(e, process.ProcessTimeout) else 'interrupted'
+            job.error = f'probe {"timed out" if job.decision == "timeout" else "interrupted"}: {e}'
+            logging.error(f"Could not analyze {job.current_path}: {job.error}")
+            return job.decision
+    job.decision, reason = probe.classify(
+        job.media_info,
+        skip_codecs=tuple(config.get('skip_codecs', probe.DEFAULT_SKIP_CODECS)),
+        remux_codecs=tuple(config.get('remux_codecs', probe.DEFAULT_REMUX_CODECS)),
+        remux_max_bpp=float(config.get('remux_max_bits_per_pixel', probe.DEFAULT_REMUX_MAX_BPP))
+    )
+    logging.info(f"Decision for {job.current_path}: {job.decision} ({reason})")
+    return job.decision
+
+def keep_source_stream(job, config):
+    """Use the source as the output: as-is when already Matroska, otherwise remuxed into MKV"""
+    if job.current_path.suffix.lower() == '.mkv':
+        return job.current_path
+
+    transcode_path = get_transcode_path(job.current_path, config, job.tv_info, job.id)
+    duration = job.media_info.duration if job.media_info else None
+    if probe.remux_to_mkv(job.current_path, transcode_path, duration):
+        return transcode_path
+    return None
+
+def transcode_job(job, config, job_journal, threads=None, echo_output=True, planner=None):
+    """
+    Stage 2 for one job, reusing a finished transcode left by an earlier run
+    Returns: True if the job has a transcoded output
+    """
+    job.status = 'running'
+    if job.reached('transcoded') and job.transcode_path and job.transcode_path.exists():
+        logging.info(f"Resuming: already transcoded {job.current_path} -> {job.transcode_path}")
+        if planner:
+            planner.discard(job)
+    else:
+        decision = analyze_job(job, config)
+        if planner and decision != 'transcode':
+            planner.discard(job)
+        if decision in ('timeout', 'interrupted'):
+            job_journal.record_error(job, job.error, status=decision)
+            return False
+        try:
+            with job.timed('transcode'):
+                if decision == 'skip':
+                    logging.info(f"Skipping transcode, using source as-is: {job.current_path}")
+                    transcode_path = job.current_path
+                elif decision == 'remux':
+                    transcode_path = keep_source_stream(job, config)
+                else:
+                    profile = planner.choose(job) if planner else None
+                    started = time.monotonic()
+                    transcode_path = None
+                    try:
+                        transcode_path, job.encode_stats = transcode_file(
+                            job.current_path, config, threads, echo_output, job.tv_info, profile, job.media_info,
+                            transcode_path=get_transcode_path(job.current_path, config, job.tv_info, job.id)
+                        )
+                    finally:
+                        if planner:
+                            planner.record(job, profile, time.monotonic() - started if transcode_path else None)
+                    transcode_path = guard_output_size(job, transcode_path, config)
+        except process.ProcessTimeout as e:
+            job_journal.record_error(job, f'{decision} timed out: {e}', status='timeout')
+            return False
+        except process.ProcessInterrupted as e:
+            job_journal.record_error(job, f'{decision} interrupted: {e}', status='interrupted')
+            return False
+        if not transcode_path:
+            job_journal.record_error(job, f'{decision} failed')
+            return False
+        job_journal.advance(job, 'transcoded', transcode_path=transcode_path)
+
+    job.destination_path = get_job_destination_path(job, config)
+    return True
+
+def guard_output_size(job, transcode_path, config):
+    """Fall back to the source stream when the encode came out no smaller than the source"""
+    if not transcode_path or not config.get('keep_source_if_smaller', True):
+        return transcode_path
+
+    source_size = job.current_path.stat().st_size
+    output_size = transcode_path.stat().st_size
+    if output_size < source_size:
+        return transcode_path
+
+    logging.warning(f"Transcode of {job.current_path.name} is no smaller than its source "
+                    f"({output_size} >= {source_size} bytes), keeping the source stream")
+    cleanup_failed_file(transcode_path)
+    job.decision = 'remux'
+    return keep_source_stream(job, config)
+
+def test_job(job, config, job_journal):
+    """Stage 3 for one job; a failed output is removed so the next run re-encodes it"""
+    if job.reached('qc_passed'):
+        logging.info(f"Resuming: already passed quality tests {job.transcode_path}")
+        return True
+
+    logging.info(f"Testing: {job.transcode_path}")
+    error, status = 'quality tests failed', 'failed'
+    try:
+        with job.timed('test'):
+            passed = test_transcoded_file(job.transcode_path, config)
+            # Skips and remuxes copy the source stream, so there is nothing to compare
+            if (passed and config.get('qc_fidelity_enabled', False) and job.decision in (None, 'transcode')
+                    and job.transcode_path != job.current_path):
+                passed = test_fidelity(job.current_path, job.transcode_path, config)
+    except process.ProcessTimeout as e:
+        passed = False
+        error, status = f'quality tests timed out: {e}', 'timeout'
+    except process.ProcessInterrupted as e:
+        passed = False
+        error, status = f'quality tests interrupted: {e}', 'interrupted'
+    if not passed:
+        logging.error(f"Failed quality tests: {job.transcode_path}")
+        # A skipped job's "output" is the source itself, which must never be deleted
+        if job.transcode_path != job.current_path:
+            cleanup_failed_file(job.transcode_path)
+        job_journal.record_error(job, error, status)
+        return False
+
+    job_journal.advance(job, 'qc_passed')
+    return True
+
+def get_library_index(config):
+    """Shared index of movies_directory and tv_directory, or None if library checks are off"""
+    if not config.get('library_check_enabled', True):
+        return None
+    return library.get_default_index(
+        [config['movies_directory'], config['tv_directory']],
+        config.get('library_index_path', library.INDEX_PATH),
+        float(config.get('library_refresh_seconds', library.DEFAULT_REFRESH_SECONDS))
+    )
+
+def in_library(job, config, job_journal):
+    """
+    Check a job's planned destination against the library before it is encoded
+    Returns: True if the library already has the title and library_policy is 'skip'
+    """
+    library_index = get_library_index(config)
+    # A finished transcode is judged by claim_destination; a lost one is encoded again, so check first
+    if library_index is None or (job.reached('transcoded') and job.transcode_path
+                                 and job.transcode_path.exists()):
+        return False
+
+    # Encodes come out as .mkv; the index ignores extensions, so skips and remuxes match too
+    planned_path = get_destination_path(job.current_path.with_suffix('.mkv'), config)
+    action, _, existing = library.resolve_destination(library_index, planned_path,
+                                                      config.get('library_policy', 'skip'))
+    if action != 'skip':
+        return False
+    logging.info(f"Skipping {job.current_path}: already in the library as {existing.path}")
+    # Left at its stage, so it is picked up again if the library copy goes away
+    job_journal.record_error(job, f"already in library: {existing.path}", status='in_library')
+    return True
+
+def in_retry_backoff(job, config, job_journal, now=None):
+    """
+    Hold back a job whose last attempt failed, so watch mode does not retry a broken file on
+    every rescan. The wait starts at watch_retry_seconds and doubles with each failure up to
+    watch_retry_max_seconds; a source written or replaced since the failure is retried at once.
+    Returns: True if the job should be left alone for now
+    """
+    failure = job_journal.last_failure(job)
+    # An interrupted attempt says nothing about the file
+    if failure is None or failure.kind == 'interrupted':
+        return False
+    try:
+        stat = job.current_path.stat()
+    except OSError:
+        return False
+    if max(stat.st_mtime, stat.st_ctime) > failure.failed_at:
+        return False
+
+    wait = min(float(config.get('watch_retry_seconds', 600)) * 2 ** max(failure.failures - 1, 0),
+               float(config.get('watch_retry_max_seconds', 86400)))
+    if (now or time.time()) - failure.failed_at >= wait:
+        return False
+    logging.debug(f"Not retrying {job.current_path} yet: {failure.error} ({failure.failures} failure(s))")
+    return True
+
+def skip_library_hits(jobs, config, job_journal):
+    """Drop jobs whose title is already in the library; returns the remaining {job_id: Job}"""
+    return {job_id: job for job_id, job in jobs.items() if not in_library(job, config, job_journal)}
+
+def claim_destination(job, config, job_journal):
+    """
+    Apply library_policy to a finished job's destination just before it is moved,
+    pointing job.destination_path at the final name
+    Returns: (proceed, library file to remove after the move or None)
+    """
+    library_index = get_library_index(config)
+    if library_index is None:
+        return True, None
+
+    action, path, existing = library.resolve_destination(
+        library_index, job.destination_path, config.get('library_policy', 'skip'),
+        new_size=job.transcode_path.stat().st_size
+    )
+    if action == 'skip':
+        logging.warning(f"Not moving {job.transcode_path.name}: the library copy {existing.path} "
+                        f"({existing.size} bytes) is kept under library_policy "
+                        f"'{config.get('library_policy', 'skip')}'")
+        if job.transcode_path != job.current_path:
+            cleanup_failed_file(job.transcode_path)
+        # Retired rather than left at its stage: the pre-check would pass it again (the encode size
+        # is unknown then), so the next run would only encode and discard it once more
+        job_journal.retire(job, f"already in library: {existing.path}")
+        return False, None
+
+    if action == 'keep_both':
+        logging.info(f"{existing.path} is already in the library, keeping both as {path.name}")
+    elif action == 'replace':
+        logging.info(f"Replacing {existing.path} ({existing.size} bytes) with a smaller encode")
+    job.destination_path = path
+    replaced = Path(existing.path) if action == 'replace' and Path(existing.path) != path else None
+    return True, replaced
+
+def finalize_job(job, config, job_journal):
+    """
+    Stage 4 for one job: move it to the library, clean up its source and mark it done
+    Returns: True if the file reached its final destination
+    """
+    proceed, replaced = claim_destination(job, config, job_journal)
+    if not proceed:
+        return False
+
+    with job.timed('move'):
+        moved = move_to_final_destination(job.transcode_path, config, job.destination_path)
+    if not moved:
+        logging.error(f"Failed to move file to destination: {job.transcode_path}")
+        job_journal.record_error(job, 'move failed')
+        return False
+
+    library_index = get_library_index(config)
+    if replaced:
+        # Same title in another container; the new file has taken its place
+        if library_index is not None:
+            library_index.discard(replaced)
+        try:
+            replaced.unlink(missing_ok=True)
+            logging.info(f"Removed replaced library file: {replaced}")
+        except OSError as e:
+            logging.error(f"Error removing replaced library file {replaced}: {e}")
+    if library_index is not None:
+        library_index.add(job.destination_path, job.destination_path.stat().st_size)
+
+    # Skipped jobs moved the source itself, so there is nothing left to clean up
+    if job.transcode_path != job.current_path:
+        cleanup_source_file(job.current_path)
+    job_journal.advance(job, 'moved')
+    job.status = 'done'
+    record_telemetry(job, config)
+    timings = ', '.join(f"{stage} {seconds:.1f}s" for stage, seconds in job.timings.items())
+    logging.info(f"Finished job {job.id}: {job.source_path} -> {job.destination_path} ({timings})")
+    return True
+
+@spans.timed()
+def record_telemetry(job, config):
+    """Add a finished job's metrics to the telemetry store; a failure here never fails the job"""
+    if not config.get('telemetry_enabled', True):
         return
+    try:
+        output_bytes = job.destination_path.stat().st_size
+        telemetry.get_default_store(config.get('telemetry_path', telemetry.STORE_PATH)).record(job, output_bytes)
+    except Exception as e:
+        logging.error(f"Error recording telemetry for {job.source_path}: {e}")
+
+def test_and_queue_move(job, config, job_journal, move_queue):
+    """
+    Run quality tests on one transcoded job and hand it to the background mover if it passes
+    Returns: Future of the queued move, or None if the job failed its tests
+    """
+    if not test_job(job, config, job_journal):
+        return None
+    return move_queue.submit(finalize_job, job, config, job_journal)
+
+def run_scheduled(job_queue, func, max_workers):
+    """
+    Call func on every job in a Scheduler using max_workers transcode threads,
+    each taking the scheduler's next pick whenever it becomes free.
+    After Ctrl-C the workers finish the job whose tool was just killed and take no more.
+    Returns: {job_id: result}
+    """
+    results = {}
+
+    def worker():
+        while not process.interrupted.is_set() and (job := job_queue.pop()) is not None:
+            results[job.id] = func(job)
 
+    try:
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='transcode'
+        ) as executor:
+            for future in [executor.submit(worker) for _ in range(max_workers)]:
+                future.result()
+    finally:
+        if process.interrupted.is_set() and len(job_queue):
+            logging.info(f"Interrupted: {len(job_queue)} queued job(s) were not started; "
+                         "they resume on the next run")
+    return results
+
+def process_files_staged(jobs, config, job_journal):
+    """Run each stage over the whole batch before starting the next one"""
     # Stage 1: Rename all files (keeping original structure)
     logging.info("=== Stage 1: Renaming Files ===")
-    renamed_files = []
-    for file_path in video_files:
-        logging.info(f"Processing: {file_path}")
-        tv_info = parse_tv_show(file_path)
-        
-        if tv_info:
-            show_title, season_num, episode_num = tv_info
-            new_filename = f"S{season_num:02d}E{episode_num:02d}{file_path.suffix}"
-            new_path = file_path.parent / new_filename
-            os.rename(file_path, new_path)
-            renamed_files.append(new_path)
-            logging.info(f"Renamed to: {new_path}")
-        else:
-            renamed_files.append(file_path)
+    for job in jobs.values():
+        rename_job(job, job_journal)
+
+    # Probe every source so the batch log shows what will be skipped, remuxed or encoded
+    logging.info("\n=== Analyzing Sources ===")
+    planner = create_speed_planner(config)
+    for job in jobs.values():
+        if not job.reached('transcoded') and analyze_job(job, config) == 'transcode':
+            planner.add(job)
 
     # Stage 2: Transcode files
     logging.info("\n=== Stage 2: Transcoding Files ===")
-    transcoded_files = []
-    for source_path in renamed_files:
-        tv_info = parse_tv_show(source_path)
-        
-        if tv_info:
-            show_title, season_num, _ = tv_info
-            transcode_path = create_tv_structure(
-                config['transcode_directory'],
-                show_title,
-                season_num
-            ) / source_path.name.replace(source_path.suffix, '.mkv')
-        else:
-            transcode_path = Path(config['transcode_directory']) / source_path.name.replace(source_path.suffix, '.mkv')
-        
-        logging.info(f"Transcoding: {source_path} -> {transcode_path}")
-        if handbrake.transcode_video(str(source_path), str(transcode_path)):
-            transcoded_files.append(transcode_path)
-        else:
-            logging.error(f"Failed to transcode: {source_path}")
+    max_workers, threads = get_transcode_workers(config)
+    logging.info(f"Running up to {max_workers} transcode(s) at once"
+                 f" with {threads or 'all'} thread(s) each")
+
+    job_queue = scheduler.create_scheduler(config, planner)
+    for job in jobs.values():
+        job_queue.add(job)
+    results = run_scheduled(
+        job_queue,
+        lambda job: transcode_job(job, config, job_journal, threads, max_workers == 1, planner),
+        max_workers
+    )
+    # Later stages keep discovery order
+    transcoded_ids = [job_id for job_id in jobs if results.get(job_id)]
 
     # Stage 3: Test all transcoded files
     logging.info("\n=== Stage 3: Testing Files ===")
-    passed_files = []
-    for transcode_path in transcoded_files:
-        logging.info(f"Testing: {transcode_path}")
-        if test_transcoded_file(transcode_path):
-            passed_files.append(transcode_path)
-        else:
-            logging.error(f"Failed quality tests: {transcode_path}")
-            cleanup_failed_file(transcode_path)
+    passed_ids = [job_id for job_id in transcoded_ids if test_job(jobs[job_id], config, job_journal)]
 
-    if not passed_files:
+    if not passed_ids:
         logging.error("No files passed quality tests. Stopping process.")
         return
 
     # Stage 4: Move files to final destination
     logging.info("\n=== Stage 4: Moving Files to Final Destination ===")
-    for transcode_path in passed_files:
-        if move_to_final_destination(transcode_path, config):
-            # Find the original source file
-            source_path = next((p for p in renamed_files if p.stem == transcode_path.stem), None)
-            if source_path:
-                cleanup_source_file(source_path)
-                processed_files.add(str(source_path))
-                save_progress(processed_files)
+    for job_id in passed_ids:
+        finalize_job(jobs[job_id], config, job_journal)
+
+def process_files_streaming(jobs, config, job_journal):
+    """
+    Push each file through rename -> transcode -> test -> move as soon as it is ready,
+    so finished files are tested, moved and checkpointed while later ones still encode
+    """
+    max_workers, threads = get_transcode_workers(config)
+    finalize_workers = max(1, int(config.get('max_parallel_finalize', 1)))
+    logging.info("=== Streaming Pipeline: Rename -> Transcode -> Test -> Move ===")
+    logging.info(f"Running up to {max_workers} transcode(s) at once"
+                 f" with {threads or 'all'} thread(s) each")
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=finalize_workers,
+        thread_name_prefix='finalize'
+    ) as finalize_pool, mover.BackgroundMover() as move_queue:
+        planner = create_speed_planner(config)
+        job_queue = scheduler.create_scheduler(config, planner)
+        for job in jobs.values():
+            rename_job(job, job_journal)
+            # Ordering by cost needs every file probed before the first one starts
+            if job_queue.policy != 'fifo' and not job.reached('transcoded'):
+                analyze_job(job, config)
+            planner.add(job)
+            job_queue.add(job)
+
+        finalize_futures = []
+
+        def transcode_and_finalize(job):
+            if transcode_job(job, config, job_journal, threads, max_workers == 1, planner):
+                finalize_futures.append(finalize_pool.submit(
+                    test_and_queue_move, job, config, job_journal, move_queue
+                ))
+
+        run_scheduled(job_queue, transcode_and_finalize, max_workers)
+
+        # Moves run on their own I/O thread, so tests of later files are never held up by them
+        move_futures = [future.result() for future in concurrent.futures.as_completed(finalize_futures)]
+        moved = sum(1 for future in move_futures if future and future.result())
+
+    logging.info(f"{moved} of {len(jobs)} file(s) reached their final destination")
+
+def fingerprint_job(job, config, job_journal):
+    """Fingerprint a job's source once; the journal keeps it for later runs"""
+    if job.fingerprint is None:
+        try:
+            job_journal.set_fingerprint(job, fingerprint.content_fingerprint(
+                job.current_path, int(config.get('fingerprint_block_size', fingerprint.DEFAULT_BLOCK_SIZE))
+            ))
+        except OSError as e:
+            logging.warning(f"Could not fingerprint {job.current_path}: {e}")
+    return job.fingerprint
+
+def is_duplicate(job, job_journal, claimed=None):
+    """
+    Check a fingerprinted job against content that was already processed
+    Args:
+        job (Job): Job that has not started yet
+        job_journal (JobJournal): Journal holding earlier jobs' fingerprints
+        claimed (dict): {fingerprint: Job} of jobs taken this run, updated in place
+    Returns:
+        bool: True if the job should not be processed
+    """
+    if job.fingerprint is None:
+        return False
+
+    original = job_journal.find_processed(job.fingerprint, job.id)
+    if original:
+        job_journal.mark_duplicate(job, original)
+        logging.info(f"Skipping {job.current_path}: same content as {original.source_path}, already processed")
+        return True
+
+    if claimed is not None:
+        # The copy that is left waiting is re-checked next run, after the first has (or has not) made it
+        first = claimed.setdefault(job.fingerprint, job)
+        if first is not job:
+            logging.info(f"Skipping {job.current_path} for now: same content as {first.current_path}")
+            return True
+    return False
+
+def skip_duplicate_jobs(jobs, config, job_journal):
+    """
+    Drop jobs whose source content was already processed under another name
+    Args:
+        jobs (dict): {job_id: Job} in discovery order
+    Returns:
+        dict: The jobs that remain, in the same order
+    """
+    # Only jobs that have not started: a partly processed job already won any tie
+    pending = [job for job in jobs.values() if not job.reached('renamed')]
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=max(1, int(config.get('fingerprint_workers', 4))),
+        thread_name_prefix='fingerprint'
+    ) as executor:
+        list(executor.map(lambda job: fingerprint_job(job, config, job_journal), pending))
+
+    claimed = {job.fingerprint: job for job in jobs.values() if job.reached('renamed') and job.fingerprint}
+    return {job_id: job for job_id, job in jobs.items()
+            if job.reached('renamed') or not is_duplicate(job, job_journal, claimed)}
+
+@spans.timed()
+def discover_job(path, config, job_journal, size=None, mtime_ns=None):
+    """Journal entry for a source file, started over if the file was replaced since it was recorded"""
+    if size is None:
+        try:
+            stat = os.stat(path)
+            size, mtime_ns = stat.st_size, stat.st_mtime_ns
+        except OSError:
+            pass
+    block_size = int(config.get('fingerprint_block_size', fingerprint.DEFAULT_BLOCK_SIZE))
+    return job_journal.discover(path, size, mtime_ns,
+                                fingerprint=lambda: fingerprint.content_fingerprint(path, block_size))
+
+def discover_jobs(config, job_journal, full_rescan=False):
+    """
+    Find media files in the source directory that have not reached the library yet
+    Returns: {job_id: Job} in discovery order
+    """
+    scan_index = scan.ScanIndex(config.get('scan_index_path', '.scan_index.db'))
+    jobs = {}
+
+    try:
+        for entry in scan.iter_media_files(config['source_directory'], scan_index, full_rescan):
+            job = discover_job(entry.path, config, job_journal, entry.size, entry.mtime_ns)
+            if not job.reached('moved'):
+                jobs[job.id] = job
+    finally:
+        scan_index.close()
+
+    if config.get('skip_duplicate_content', True):
+        jobs = skip_duplicate_jobs(jobs, config, job_journal)
+    return skip_library_hits(jobs, config, job_journal)
+
+def process_all_files(config, full_rescan=False):
+    """Process all media files using the configured pipeline mode"""
+    job_journal = open_journal(config)
+
+    try:
+        jobs = discover_jobs(config, job_journal, full_rescan)
+
+        if not jobs:
+            logging.info("No new files to process")
+            return
+
+        pipeline_mode = config.get('pipeline_mode', 'staged')
+        if pipeline_mode == 'streaming':
+            process_files_streaming(jobs, config, job_journal)
         else:
-            logging.error(f"Failed to move file to destination: {transcode_path}")
+            process_files_staged(jobs, config, job_journal)
+
+        logging.info("\n=== Processing Complete ===")
+    finally:
+        job_journal.close()
 
-    logging.info("\n=== Processing Complete ===")
+def install_stop_handlers(stop_event):
+    """Make SIGTERM/SIGINT set stop_event so running work can finish cleanly"""
+    def request_stop(signum, frame):
+        logging.info(f"Received signal {signum}, finishing running jobs before exit")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+def open_work_queue(config):
+    """Shared-directory job queue used by the coordinator and its workers"""
+    return cluster.WorkQueue(
+        config.get('cluster_directory', '.cluster'),
+        float(config.get('cluster_lease_seconds', cluster.DEFAULT_LEASE_SECONDS))
+    )
+
+def run_coordinator(config, full_rescan=False):
+    """
+    Own the job queue for a group of encode hosts. Files are renamed and analysed here,
+    full transcodes are leased to workers through the cluster directory, and each
+    result is tested and moved here, where the journal lives. Expired leases from
+    dead workers are re-queued until cluster_max_attempts is reached.
+    """
+    job_journal = open_journal(config)
+    work_queue = open_work_queue(config)
+    stop_event = threading.Event()
+    install_stop_handlers(stop_event)
+    poll_interval = float(config.get('cluster_poll_seconds', 5))
+    max_attempts = int(config.get('cluster_max_attempts', cluster.DEFAULT_MAX_ATTEMPTS))
+    finalize_workers = max(1, int(config.get('max_parallel_finalize', 1)))
+
+    try:
+        jobs = discover_jobs(config, job_journal, full_rescan)
+        if not jobs:
+            logging.info("No new files to process")
+            return
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=finalize_workers,
+            thread_name_prefix='finalize'
+        ) as finalize_pool, mover.BackgroundMover() as move_queue:
+            finalize_futures = []
+            outstanding = {}
+            job_queue = scheduler.create_scheduler(config, create_speed_planner(config))
+            for job in jobs.values():
+                rename_job(job, job_journal)
+                if job.reached('transcoded') or analyze_job(job, config) != 'transcode':
+                    # Skips, remuxes and finished encodes need no encode host
+                    if transcode_job(job, config, job_journal):
+                        finalize_futures.append(finalize_pool.submit(
+                            test_and_queue_move, job, config, job_journal, move_queue
+                        ))
+                    continue
+                job_queue.add(job)
+
+            # Workers claim the oldest ticket first, so enqueue in scheduling order
+            for job in job_queue.drain():
+                work_queue.enqueue(f"job-{job.id:08d}", {
+                    'job_id': job.id,
+                    'source_path': str(job.current_path),
+                    'transcode_path': str(get_transcode_path(job.current_path, config, job.tv_info, job.id)),
+                })
+                outstanding[job.id] = job
+
+            logging.info(f"=== Coordinator: {len(outstanding)} transcode(s) queued in {work_queue.root} ===")
+            while outstanding and not stop_event.is_set():
+                work_queue.requeue_expired(max_attempts)
+                for result in work_queue.collect():
+                    job = outstanding.pop(result.get('job_id'), None)
+                    if job is None:
+                        continue
+                    if not result.get('ok'):
+                        logging.error(f"Worker {result.get('worker_id')} failed {job.current_path}: "
+                                      f"{result.get('error')}")
+                        job_journal.record_error(job, f"worker {result.get('worker_id')}: {result.get('error')}",
+                                                 'timeout' if result.get('timed_out') else 'failed')
+                        continue
+
+                    logging.info(f"Worker {result['worker_id']} transcoded {job.current_path} "
+                                 f"in {result.get('seconds', 0):.1f}s")
+                    job.timings['transcode'] = result.get('seconds', 0.0)
+                    job.encode_stats = result.get('stats')
+                    try:
+                        transcode_path = guard_output_size(job, Path(result['transcode_path']), config)
+                    except process.ProcessTimeout as e:
+                        job_journal.record_error(job, f'remux timed out: {e}', status='timeout')
+                        continue
+                    if not transcode_path:
+                        job_journal.record_error(job, 'remux failed')
+                        continue
+                    job_journal.advance(job, 'transcoded', transcode_path=transcode_path)
+                    job.destination_path = get_job_destination_path(job, config)
+                    finalize_futures.append(finalize_pool.submit(
+                        test_and_queue_move, job, config, job_journal, move_queue
+                    ))
+                if outstanding:
+                    stop_event.wait(poll_interval)
+
+            if outstanding:
+                logging.info(f"Stopping with {len(outstanding)} transcode(s) still queued or leased; "
+                             "they are picked up again on the next start")
+
+            move_futures = [future.result() for future in concurrent.futures.as_completed(finalize_futures)]
+            moved = sum(1 for future in move_futures if future and future.result())
+        logging.info(f"{moved} of {len(jobs)} file(s) reached their final destination")
+    finally:
+        job_journal.close()
+
+def run_worker(config, exit_when_idle=False):
+    """
+    Lease transcodes from the coordinator's cluster directory and encode them until stopped.
+    Each worker process encodes one file at a time; run several for more parallelism. Every
+    host must see the source and transcode directories at the same paths as the coordinator.
+    """
+    work_queue = open_work_queue(config)
+    worker_id = config.get('cluster_worker_id') or cluster.default_worker_id()
+    stop_event = threading.Event()
+    install_stop_handlers(stop_event)
+    poll_interval = float(config.get('cluster_poll_seconds', 5))
+    _, threads = get_transcode_workers(config)
+
+    logging.info(f"=== Worker {worker_id}: waiting for jobs in {work_queue.root} ===")
+    while not stop_event.is_set():
+        lease = work_queue.claim(worker_id)
+        if lease is None:
+            if exit_when_idle:
+                break
+            stop_event.wait(poll_interval)
+            continue
+
+        source_path = Path(lease.ticket['source_path'])
+        output_path = cluster.partial_path(lease.ticket['transcode_path'], worker_id)
+        logging.info(f"Leased {lease.key}: {source_path}")
+        started = time.monotonic()
+        error = 'transcode failed'
+        timed_out = False
+        with lease:
+            try:
+                # The duration also sets the encode's time limit
+                media_info = probe.probe_media(source_path)
+                transcoded, stats = transcode_file(source_path, config, threads, True, media_info=media_info,
+                                                   transcode_path=output_path)
+            except process.ProcessTimeout as e:
+                transcoded, stats = None, None
+                error, timed_out = f'transcode timed out: {e}', True
+        if not transcoded:
+            output_path.unlink(missing_ok=True)
+
+        result = {
+            'ok': bool(transcoded),
+            'transcode_path': lease.ticket['transcode_path'],
+            'seconds': time.monotonic() - started,
+            'error': None if transcoded else error,
+            'timed_out': timed_out,
+            'stats': stats,
+        }
+        if not lease.complete(result, output_path if transcoded else None):
+            logging.warning(f"Lease on {lease.key} expired before it finished; result discarded")
+
+    logging.info(f"Worker {worker_id} stopped")
+
+def run_watch_mode(config):
+    """
+    Keep running, feeding each new source file into the transcode pipeline once it
+    has finished downloading. SIGTERM/SIGINT stop intake, let running jobs finish
+    and leave queued ones in the journal for the next start.
+    """
+    job_journal = open_journal(config)
+    scan_index = scan.ScanIndex(config.get('scan_index_path', '.scan_index.db'))
+    stop_event = threading.Event()
+    install_stop_handlers(stop_event)
+
+    max_workers, threads = get_transcode_workers(config)
+    finalize_workers = max(1, int(config.get('max_parallel_finalize', 1)))
+    # Bound the number of jobs queued or running so memory stays flat on huge backlogs
+    queue_slots = threading.BoundedSemaphore(int(config.get('watch_max_queued', max_workers * 2)))
+    active_jobs = {}
+    active_lock = threading.Lock()
+
+    transcode_pool = concurrent.futures.ThreadPoolExecutor(
+        max_workers=max_workers,
+        thread_name_prefix='transcode'
+    )
+    finalize_pool = concurrent.futures.ThreadPoolExecutor(
+        max_workers=finalize_workers,
+        thread_name_prefix='finalize'
+    )
+    move_queue = mover.BackgroundMover()
+    planner = create_speed_planner(config)
+
+    def release(job):
+        with active_lock:
+            active_jobs.pop(job.id, None)
+        queue_slots.release()
+
+    def on_tested(job, future):
+        move_future = None if future.exception() else future.result()
+        if move_future:
+            move_future.add_done_callback(lambda f: release(job))
+        else:
+            release(job)
+
+    def on_transcoded(job, future):
+        if future.cancelled() or future.exception() or not future.result():
+            release(job)
+            return
+        finalize_pool.submit(test_and_queue_move, job, config, job_journal, move_queue).add_done_callback(
+            lambda f: on_tested(job, f)
+        )
+
+    def on_stable(path):
+        job = discover_job(path, config, job_journal)
+        if job.reached('moved') or in_retry_backoff(job, config, job_journal):
+            return
+        if config.get('skip_duplicate_content', True) and not job.reached('renamed'):
+            fingerprint_job(job, config, job_journal)
+            if is_duplicate(job, job_journal):
+                return
+        if in_library(job, config, job_journal):
+            return
+        with active_lock:
+            if job.id in active_jobs:
+                return
+            if job.fingerprint and any(other.fingerprint == job.fingerprint for other in active_jobs.values()):
+                logging.info(f"Skipping {job.current_path} for now: same content is already being processed")
+                return
+            active_jobs[job.id] = job
+
+        # Wait for a free slot, giving up if we are asked to stop meanwhile
+        while not queue_slots.acquire(timeout=1):
+            if stop_event.is_set():
+                with active_lock:
+                    active_jobs.pop(job.id, None)
+                return
+
+        rename_job(job, job_journal)
+        planner.add(job)
+        future = transcode_pool.submit(transcode_job, job, config, job_journal, threads, False, planner)
+        future.add_done_callback(lambda f: on_transcoded(job, f))
+
+    try:
+        watch.watch_for_stable_files(
+            config['source_directory'],
+            on_stable,
+            stop_event,
+            stable_seconds=float(config.get('watch_stable_seconds', 30)),
+            poll_interval=float(config.get('watch_poll_seconds', 5)),
+            rescan_interval=float(config.get('watch_rescan_seconds', 600)),
+            max_pending=int(config.get('watch_max_pending', 10000)),
+            use_inotify=config.get('watch_use_inotify', True),
+            scan_index=scan_index
+        )
+    finally:
+        # Running encodes finish; queued ones are cancelled and resume from the journal next time
+        transcode_pool.shutdown(wait=True, cancel_futures=True)
+        finalize_pool.shutdown(wait=True)
+        move_queue.shutdown(wait=True)
+        scan_index.close()
+        job_journal.close()
+        logging.info("Watch mode stopped")
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Rename, transcode and file media into the library")
+    parser.add_argument('command', nargs='?', default='run',
+                        choices=['run', 'watch', 'coordinator', 'worker', 'stats'],
+                        help="'run' processes the current backlog once, "
+                             "'watch' keeps running and processes new files as they arrive, "
+                             "'coordinator' hands the backlog's transcodes to 'worker' processes "
+                             "through the shared cluster directory, "
+                             "'stats' reports throughput and savings from the telemetry store")
+    parser.add_argument('--full-rescan', action='store_true',
+                        help="List every source directory instead of trusting the scan index")
+    parser.add_argument('--exit-when-idle', action='store_true',
+                        help="Worker only: exit once the cluster queue is empty")
+    parser.add_argument('--days', type=float, default=30,
+                        help="Stats only: time window in days, 0 for all time (default: 30)")
+    parser.add_argument('--profile', action='store_true',
+                        help="Sample every thread's Python stack during the run and write "
+                             "logs/profile_<timestamp>.folded for flamegraph tools")
+    return parser.parse_args()
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.command == 'stats':
+        # Read-only report: no log file and no directories are created
+        with open('config.json', 'r') as config_file:
+            config = json.load(config_file)
+        telemetry.show_stats(config.get('telemetry_path', telemetry.STORE_PATH), args.days or None)
+        raise SystemExit(0)
+
+    run_started = time.monotonic()
+    profiler = None
     try:
         # Create logs directory and setup logging
         setup_logging()
+        if args.profile:
+            profiler = spans.SamplingProfiler().start()
         
         # Read configuration
         with open('config.json', 'r') as config_file:
             config = json.load(config_file)
+        process.configure(config.get('process_limits', {}))
+        # Watch, coordinator and worker modes replace this with their graceful stop handlers
+        process.install_interrupt_handler()
             
         # Create required directories
         required_dirs = [
@@ -279,7 +1150,22 @@ if __name__ == "__main__":
             logging.info(f"Created/verified directory: {config[dir_key]}")
             
         # Process files
-        process_all_files(config)
+        if args.command == 'watch':
+            run_watch_mode(config)
+        elif args.command == 'coordinator':
+            run_coordinator(config, args.full_rescan)
+        elif args.command == 'worker':
+            run_worker(config, args.exit_when_idle)
+        else:
+            process_all_files(config, args.full_rescan)
         
     except Exception as e:
         logging.error(f"Fatal error: {e}")
+    finally:
+        spans.log_summary(time.monotonic() - run_started)
+        if profiler:
+            profiler.stop()
+            profile_path = Path('logs') / f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.folded"
+            profiler.write_folded(profile_path)
+            logging.info(f"\n=== Profile ===\n{profiler.summary()}")
+            logging.info(f"Collapsed stacks written to {profile_path}")
@@ -1,7 +1,32 @@
 import subprocess
 import json
 import sys
+try:
+    from scripts import process, spans
+except ImportError:  # Run directly as python3 scripts/audio_test.py
+    import process
+    import spans
 
+# Average volume below this is treated as a silent audio track
+SILENCE_THRESHOLD_DB = -70
+
+def parse_mean_volume(ffmpeg_stderr):
+    """
+    Extract the mean volume reported by ffmpeg's volumedetect filter
+    Args:
+        ffmpeg_stderr (str): stderr captured from an ffmpeg run using volumedetect
+    Returns:
+        float: Mean volume in dB, or None if it was not reported
+    Raises:
+        ValueError: If the mean_volume line cannot be parsed
+    """
+    for line in ffmpeg_stderr.split('\n'):
+        if 'mean_volume' in line:
+            # Extract the dB value
+            return float(line.split(':')[1].strip().replace(' dB', ''))
+    return None
+
+@spans.timed()
 def get_average_volume(file_path):
     """
     Calculate the average volume level in decibels for a video file using ffmpeg
@@ -9,6 +34,8 @@ def get_average_volume(file_path):
         file_path (str): Path to the video file
     Returns:
         float: Average volume in dB, or None if analysis fails
+    Raises:
+        ProcessKilled: ffmpeg was killed by its time limit or an interrupt
     """
     try:
         # Run ffmpeg with volume detection filter
@@ -24,18 +51,18 @@ def get_average_volume(file_path):
         ]
 
         # Run command and capture stderr where ffmpeg writes the volume stats
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result = process.run_tool(cmd, 'qc')
         
         # Parse mean volume from ffmpeg output
-        for line in result.stderr.split('\n'):
-            if 'mean_volume' in line:
-                # Extract the dB value
-                mean_db = float(line.split(':')[1].strip().replace(' dB', ''))
-                return mean_db
+        mean_db = parse_mean_volume(result.stderr)
+        if mean_db is not None:
+            return mean_db
                 
         print(f"Could not find volume information in {file_path}")
         return None
         
+    except process.ProcessKilled:
+        raise
     except subprocess.SubprocessError as e:
         print(f"Error running ffmpeg: {e}")
         return None
@@ -0,0 +1,250 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import subprocess
+import concurrent.futures
+from pathlib import Path
+
+try:
+    from scripts import handbrake, probe, process, spans
+except ImportError:
+    import handbrake
+    import probe
+    import process
+    import spans
+
+# Joined output may differ from the source by about a frame per segment boundary
+DURATION_TOLERANCE = 1.0
+
+def run_ffmpeg_tool(cmd, tool_class='mux', duration=None):
+    """
+    Run ffmpeg/ffprobe, returning stdout or None (after logging stderr) on failure
+    Raises: ProcessTimeout if the tool was killed by its time limit or stall watchdog
+    """
+    try:
+        result = process.run_tool(cmd, tool_class, duration)
+    except process.ProcessKilled:
+        raise
+    except (subprocess.SubprocessError, OSError) as e:
+        logging.error(f"Error running {cmd[0]}: {e}")
+        return None
+    if result.returncode != 0:
+        logging.error(f"{cmd[0]} failed with return code {result.returncode}: {result.stderr[-2000:]}")
+        return None
+    return result.stdout
+
+def get_keyframes(file_path, duration=None):
+    """
+    Timestamps of the first video stream's keyframes, read from packet flags without decoding
+    Returns: Sorted list of seconds, or None if ffprobe failed
+    """
+    output = run_ffmpeg_tool([
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags',
+        '-of', 'csv=p=0',
+        str(file_path)
+    # Reads every packet of the file, so it is limited like a remux rather than a probe
+    ], 'mux', duration)
+    if output is None:
+        return None
+
+    keyframes = []
+    for line in output.splitlines():
+        pts_time, _, flags = line.partition(',')
+        if 'K' in flags and pts_time not in ('', 'N/A'):
+            keyframes.append(float(pts_time))
+    return sorted(keyframes)
+
+def choose_split_points(keyframes, duration, segments):
+    """
+    Pick the keyframe nearest to each even division of the title
+    Returns: Strictly increasing split times; fewer than segments - 1 if keyframes are sparse
+    """
+    points = []
+    for i in range(1, segments):
+        target = duration * i / segments
+        nearest = min(keyframes, key=lambda keyframe: abs(keyframe - target))
+        if nearest > (points[-1] if points else keyframes[0]):
+            points.append(nearest)
+    return points
+
+@spans.timed()
+def split_video(input_file, split_points, segment_dir, duration=None):
+    """
+    Copy the first video stream into one file per segment, cutting exactly at the split keyframes
+    Returns: Segment paths in order, or None on failure
+    """
+    pattern = segment_dir / 'source_%04d.mkv'
+    output = run_ffmpeg_tool([
+        'ffmpeg', '-nostats', '-y',
+        '-i', str(input_file),
+        '-map', '0:v:0',
+        '-c', 'copy',
+        '-f', 'segment',
+        '-segment_format', 'matroska',
+        '-segment_times', ','.join(f"{point:.6f}" for point in split_points),
+        '-reset_timestamps', '1',
+        str(pattern)
+    ], 'mux', duration)
+    if output is None:
+        return None
+    return sorted(segment_dir.glob('source_*.mkv'))
+
+@spans.timed()
+def join_segments(encoded_segments, input_file, output_file, segment_dir, duration=None):
+    """
+    Concatenate encoded video segments losslessly and copy every audio and subtitle
+    track, the chapters and the metadata across from the source
+    Returns: True on success
+    """
+    list_path = segment_dir / 'segments.txt'
+    with open(list_path, 'w') as f:
+        for segment in encoded_segments:
+            escaped = str(segment.resolve()).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+    cmd = [
+        'ffmpeg', '-nostats', '-y',
+        '-f', 'concat', '-safe', '0', '-i', str(list_path),
+        '-i', str(input_file),
+        '-map', '0:v',
+        '-map', '1:a?',
+        '-map', '1:s?',
+        '-map_chapters', '1',
+        '-map_metadata', '1',
+        '-c', 'copy',
+    ]
+    # MP4 text subtitles (mov_text) cannot be stored in Matroska as-is
+    if Path(input_file).suffix.lower() in ('.mp4', '.mov', '.m4v'):
+        cmd.extend(['-c:s', 'srt'])
+    cmd.extend(['-f', 'matroska', str(output_file)])
+    return run_ffmpeg_tool(cmd, 'mux', duration) is not None
+
+@spans.timed()
+def encode_segment(segment, threads, preset_path, preset_name, crop=None):
+    """Encode one source_NNNN.mkv segment to encoded_NNNN.mkv, returning its path or None"""
+    output = segment.with_name(segment.name.replace('source_', 'encoded_'))
+    stats = handbrake.transcode_video(str(segment), str(output), threads, echo_output=False,
+                                      preset_path=preset_path, preset_name=preset_name, video_only=True,
+                                      crop=crop)
+    return output if stats else None
+
+@spans.timed()
+def transcode_chunked(input_file, output_file, segments=4, workers=None, threads=None,
+                      preset_path=None, preset_name=None):
+    """
+    Encode one title as keyframe-aligned segments in parallel, then join them
+    Args:
+        input_file (str): Source video
+        output_file (str): Final .mkv
+        segments (int): Number of segments to cut the title into
+        workers (int): HandBrakeCLI processes to run at once (default: segments)
+        threads (int): Core budget shared by those processes (default: every core)
+        preset_path (str): Preset file to import
+        preset_name (str): Preset to use from that file
+    Returns:
+        dict: Final encode stats if the joined file checks out, False otherwise
+    Raises:
+        ProcessTimeout: A split, segment encode or join was killed by its time limit
+    """
+    input_path, output_path = Path(input_file), Path(output_file)
+    workers = max(1, workers or segments)
+    segment_threads = max(1, (threads or os.cpu_count() or 1) // workers)
+    segment_dir = output_path.with_name(output_path.name + '.segments')
+    start = time.monotonic()
+
+    duration = probe.probe_duration(input_path)
+    keyframes = get_keyframes(input_path, duration)
+    if not duration or not keyframes:
+        logging.error(f"Cannot segment {input_path.name}: no duration or keyframes")
+        return False
+
+    # Automatic crop would look at each segment on its own and could pick a different frame size
+    # for each; the whole title is scanned once instead, and without a result nothing is cropped
+    crop = handbrake.detect_crop(input_path) or (0, 0, 0, 0)
+
+    split_points = choose_split_points(keyframes, duration, segments)
+    logging.info(f"Encoding {input_path.name} as {len(split_points) + 1} segment(s), "
+                 f"{workers} at a time with {segment_threads} thread(s) each, "
+                 f"crop {'/'.join(str(pixels) for pixels in crop)}")
+
+    shutil.rmtree(segment_dir, ignore_errors=True)
+    segment_dir.mkdir(parents=True)
+    try:
+        source_segments = split_video(input_path, split_points, segment_dir, duration)
+        if not source_segments:
+            return False
+
+        # Each segment is its own HandBrakeCLI process; threads here only wait on them
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix='segment'
+        ) as executor:
+            encoded_segments = list(executor.map(
+                lambda segment: encode_segment(segment, segment_threads, preset_path, preset_name, crop),
+                source_segments
+            ))
+        if not all(encoded_segments):
+            logging.error(f"{encoded_segments.count(None)} segment(s) of {input_path.name} failed to encode")
+            return False
+
+        # The joined stream takes its frame size from the first segment, so any other size would be lost
+        frame_sizes = [probe.probe_frame_size(segment) for segment in encoded_segments]
+        if None in frame_sizes or len(set(frame_sizes)) > 1:
+            logging.error(f"Segments of {input_path.name} differ in frame size: {frame_sizes}")
+            return False
+
+        if not join_segments(encoded_segments, input_path, output_path, segment_dir, duration):
+            output_path.unlink(missing_ok=True)
+            return False
+
+        joined_size = probe.probe_frame_size(output_path)
+        if joined_size != frame_sizes[0]:
+            logging.error(f"Joined frame size of {input_path.name} is {joined_size}, "
+                          f"expected {frame_sizes[0]} from its segments")
+            output_path.unlink(missing_ok=True)
+            return False
+
+        # Audio is copied from the source, so check the video alone as well as the whole file
+        source_video = sum(probe.probe_duration(segment) or 0 for segment in source_segments)
+        encoded_video = sum(probe.probe_duration(segment) or 0 for segment in encoded_segments)
+        joined = probe.probe_duration(output_path) or 0
+        if abs(encoded_video - source_video) > DURATION_TOLERANCE or abs(joined - duration) > DURATION_TOLERANCE:
+            logging.error(f"Joined duration mismatch for {input_path.name}: video {encoded_video:.2f}s "
+                          f"vs {source_video:.2f}s, file {joined:.2f}s vs {duration:.2f}s")
+            output_path.unlink(missing_ok=True)
+            return False
+    finally:
+        shutil.rmtree(segment_dir, ignore_errors=True)
+
+    seconds = time.monotonic() - start
+    input_bytes = input_path.stat().st_size
+    output_bytes = output_path.stat().st_size
+    stats = {
+        'file': input_path.name,
+        'preset': preset_name,
+        'segments': len(encoded_segments),
+        'seconds': round(seconds, 3),
+        'encode_fps': None,
+        'duration': duration,
+        'realtime_factor': round(duration / seconds, 3) if seconds > 0 else None,
+        'input_bytes': input_bytes,
+        'output_bytes': output_bytes,
+        'size_ratio': round(output_bytes / input_bytes, 4),
+    }
+    logging.info(f"Successfully transcoded: {input_path.name}")
+    logging.info(f"Encode stats: {json.dumps(stats)}")
+    return stats
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python3 -m scripts.chunked <input_file> <output_file> [segments]")
+        sys.exit(1)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    result = transcode_chunked(sys.argv[1], sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 4)
+    print(f"Transcoding {'succeeded' if result else 'failed'}")
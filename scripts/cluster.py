@@ -0,0 +1,251 @@
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import threading
+from pathlib import Path
+
+# A lease not renewed for this long belongs to a dead worker and is re-queued
+DEFAULT_LEASE_SECONDS = 120
+DEFAULT_MAX_ATTEMPTS = 3
+
+def default_worker_id():
+    """Unique per process, so several workers can share one host"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+def partial_path(transcode_path, worker_id):
+    """Where a worker writes its encode before it knows it still holds the lease"""
+    transcode_path = Path(transcode_path)
+    return transcode_path.with_name(f"{transcode_path.stem}.{worker_id}.partial{transcode_path.suffix}")
+
+def write_json(path, data):
+    """Write a JSON file atomically, so readers never see half of it"""
+    path = Path(path)
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(temp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(temp_path, path)
+
+def read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+class Lease:
+    """
+    A worker's claim on one ticket. The lease file's mtime is its heartbeat; once the
+    coordinator has moved the file away, renewing fails and the lease is lost.
+    """
+
+    def __init__(self, queue, key, worker_id, ticket):
+        self.queue = queue
+        self.key = key
+        self.worker_id = worker_id
+        self.ticket = ticket
+        self.path = queue.leases_dir / f"{key}.{worker_id}.json"
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def renew(self):
+        """Push the expiry forward; returns False if the lease was taken back"""
+        try:
+            os.utime(self.path)
+            return True
+        except FileNotFoundError:
+            self.lost = True
+            return False
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.queue.lease_seconds / 3):
+            if not self.renew():
+                logging.warning(f"Lost lease on {self.key}; its result will be discarded")
+                return
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._heartbeat, name=f"lease-{self.key}", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+    def complete(self, result, output_path=None):
+        """
+        Report a result if this worker still holds the lease
+        Args:
+            result (dict): Outcome for the coordinator ('ok', 'transcode_path', 'error', ...)
+            output_path (Path): Partial encode to move into ticket['transcode_path'] on success
+        Returns:
+            bool: True if the result was accepted
+        """
+        finished_path = self.queue.finished_dir / self.path.name
+        try:
+            # Atomic hand-over: from here on the coordinator can no longer re-queue the ticket
+            os.rename(self.path, finished_path)
+        except FileNotFoundError:
+            self.lost = True
+            if output_path:
+                Path(output_path).unlink(missing_ok=True)
+            return False
+
+        if output_path and result.get('ok'):
+            os.replace(output_path, self.ticket['transcode_path'])
+        result = dict(result, key=self.key, worker_id=self.worker_id, job_id=self.ticket['job_id'])
+        write_json(self.queue.results_dir / f"{self.key}.json", result)
+        return True
+
+class WorkQueue:
+    """
+    Job queue kept in a directory every host can reach (e.g. an NFS or SMB share).
+    Each ticket is one JSON file, and moving it between subdirectories with an
+    atomic rename is what gives exactly one worker ownership:
+
+        queue/<key>.json                  waiting to be claimed
+        leases/<key>.<worker>.json        being encoded; mtime is the heartbeat
+        finished/<key>.<worker>.json      worker is done, result being written
+        results/<key>.json                outcome for the coordinator to collect
+    """
+
+    def __init__(self, root, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.root = Path(root)
+        self.lease_seconds = lease_seconds
+        self.queue_dir = self.root / 'queue'
+        self.leases_dir = self.root / 'leases'
+        self.finished_dir = self.root / 'finished'
+        self.results_dir = self.root / 'results'
+        for directory in (self.queue_dir, self.leases_dir, self.finished_dir, self.results_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+        self._last_queued_ns = 0
+
+    def known(self, key):
+        """Return True if a ticket for key is anywhere in the queue"""
+        if (self.queue_dir / f"{key}.json").exists() or (self.results_dir / f"{key}.json").exists():
+            return True
+        return any(self.leases_dir.glob(f"{key}.*.json")) or any(self.finished_dir.glob(f"{key}.*.json"))
+
+    def enqueue(self, key, ticket):
+        """Queue a ticket unless it is already queued, leased or finished; returns True if added"""
+        if self.known(key):
+            return False
+        self.write_ticket(key, dict(ticket, attempts=0, queued_at=time.time()))
+        return True
+
+    def write_ticket(self, key, ticket):
+        """Put a ticket at the back of the queue; its mtime records the queue order"""
+        ticket_path = self.queue_dir / f"{key}.json"
+        write_json(ticket_path, ticket)
+        # Strictly increasing, even when several tickets are written within one clock tick
+        self._last_queued_ns = max(time.time_ns(), self._last_queued_ns + 1)
+        os.utime(ticket_path, ns=(self._last_queued_ns, self._last_queued_ns))
+
+    def claim(self, worker_id):
+        """
+        Lease the ticket at the front of the queue
+        Returns: Lease, or None if the queue is empty
+        """
+        queued = []
+        for ticket_path in self.queue_dir.glob('*.json'):
+            try:
+                queued.append((ticket_path.stat().st_mtime_ns, ticket_path.name, ticket_path))
+            except FileNotFoundError:
+                continue
+
+        for _, _, ticket_path in sorted(queued):
+            key = ticket_path.stem
+            lease_path = self.leases_dir / f"{key}.{worker_id}.json"
+            try:
+                # rename keeps the mtime, so freshen it first or the lease would look expired
+                os.utime(ticket_path)
+                os.rename(ticket_path, lease_path)
+            except FileNotFoundError:
+                # Another worker got there first
+                continue
+            ticket = read_json(lease_path)
+            if ticket is None:
+                continue
+            return Lease(self, key, worker_id, ticket)
+        return None
+
+    def requeue_expired(self, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """
+        Take back leases whose worker stopped renewing them
+        Returns: list of (ticket, worker_id) that were re-queued or failed for good
+        """
+        reclaimed = []
+        now = time.time()
+        stale = list(self.leases_dir.glob('*.json'))
+        # A worker that died between handing over and writing its result
+        stale += [path for path in self.finished_dir.glob('*.json')
+                  if not (self.results_dir / f"{path.name.split('.', 1)[0]}.json").exists()]
+
+        for path in stale:
+            try:
+                if now - path.stat().st_mtime < self.lease_seconds:
+                    continue
+                key, worker_id = path.name[:-len('.json')].split('.', 1)
+                # Steal the file first so a late heartbeat can no longer renew it
+                stolen_path = self.root / f"{path.name}.reclaim"
+                os.rename(path, stolen_path)
+            except (FileNotFoundError, ValueError):
+                continue
+
+            ticket = read_json(stolen_path) or {}
+            ticket['attempts'] = ticket.get('attempts', 0) + 1
+            if ticket.get('transcode_path'):
+                partial_path(ticket['transcode_path'], worker_id).unlink(missing_ok=True)
+
+            if ticket['attempts'] >= max_attempts:
+                logging.error(f"Giving up on {key} after {ticket['attempts']} expired lease(s)")
+                write_json(self.results_dir / f"{key}.json", {
+                    'key': key, 'job_id': ticket.get('job_id'), 'worker_id': worker_id,
+                    'ok': False, 'error': f"lease expired {ticket['attempts']} time(s)"
+                })
+            else:
+                logging.warning(f"Lease on {key} held by {worker_id} expired, re-queuing "
+                                f"(attempt {ticket['attempts'] + 1} of {max_attempts})")
+                self.write_ticket(key, ticket)
+            stolen_path.unlink(missing_ok=True)
+            reclaimed.append((ticket, worker_id))
+        return reclaimed
+
+    def collect(self):
+        """
+        Take every reported result off the queue
+        Returns: list of result dicts
+        """
+        results = []
+        for result_path in sorted(self.results_dir.glob('*.json')):
+            result = read_json(result_path)
+            if result is None:
+                continue
+            for finished_path in self.finished_dir.glob(f"{result_path.stem}.*.json"):
+                finished_path.unlink(missing_ok=True)
+            result_path.unlink(missing_ok=True)
+            results.append(result)
+        return results
+
+    def counts(self):
+        """Number of tickets queued, leased and waiting to be collected"""
+        return {
+            'queued': sum(1 for _ in self.queue_dir.glob('*.json')),
+            'leased': sum(1 for _ in self.leases_dir.glob('*.json')),
+            'results': sum(1 for _ in self.results_dir.glob('*.json')),
+        }
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 -m scripts.cluster <cluster_directory>")
+        sys.exit(1)
+
+    work_queue = WorkQueue(sys.argv[1])
+    print(work_queue.counts())
+    for lease_path in sorted(work_queue.leases_dir.glob('*.json')):
+        age = time.time() - lease_path.stat().st_mtime
+        print(f"{lease_path.name}: renewed {age:.0f}s ago")
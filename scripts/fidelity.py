@@ -0,0 +1,159 @@
+import os
+import re
+import sys
+import time
+import subprocess
+import concurrent.futures
+from scripts import probe, process, qc, spans
+
+# Every window is compared at this width, so the cost no longer depends on the source resolution
+ANALYSIS_WIDTH = 640
+DEFAULT_MIN_SSIM = 0.95
+DEFAULT_MIN_PSNR = 35.0
+
+SSIM_PATTERN = re.compile(r'SSIM .*All:([\d.]+)')
+PSNR_PATTERN = re.compile(r'PSNR .*average:([\d.]+|inf)')
+
+class FidelityReport:
+    """Source-vs-transcode similarity over a few sampled windows"""
+
+    __slots__ = ('file_path', 'windows', 'ssim', 'psnr', 'worst_ssim', 'worst_psnr', 'errors', 'elapsed')
+
+    def __init__(self, file_path):
+        self.file_path = str(file_path)
+        self.windows = 0
+        self.ssim = None
+        self.psnr = None
+        self.worst_ssim = None
+        self.worst_psnr = None
+        self.errors = []
+        self.elapsed = 0.0
+
+    @property
+    def passed(self):
+        return not self.errors
+
+    def __repr__(self):
+        return (f"FidelityReport(file_path={self.file_path!r}, passed={self.passed}, windows={self.windows}, "
+                f"ssim={self.ssim}, psnr={self.psnr}, worst_ssim={self.worst_ssim}, "
+                f"worst_psnr={self.worst_psnr}, errors={self.errors})")
+
+def reference_crop(source_size, encoded_size):
+    """
+    Centre crop that gives the source the encode's aspect ratio, undoing HandBrake's
+    automatic black-bar cropping so the frames line up. Returns a crop filter or None.
+    """
+    (source_w, source_h), (encoded_w, encoded_h) = source_size, encoded_size
+    source_aspect, encoded_aspect = source_w / source_h, encoded_w / encoded_h
+    if abs(source_aspect - encoded_aspect) < 0.01:
+        return None
+    if encoded_aspect > source_aspect:
+        # Encode lost top/bottom bars
+        return f"crop=iw:trunc(iw*{encoded_h}/{encoded_w}/2)*2"
+    return f"crop=trunc(ih*{encoded_w}/{encoded_h}/2)*2:ih"
+
+@spans.timed()
+def compare_window(source_path, encoded_path, start, length, analysis_size, crop=None):
+    """
+    Decode the same window of both files, scale them to analysis_size and measure them
+    Returns: (ssim, psnr), either may be None if ffmpeg reported nothing
+    """
+    width, height = analysis_size
+    scale = f"scale={width}:{height}:flags=bicubic,setpts=PTS-STARTPTS,format=yuv420p"
+    reference = f"{crop},{scale}" if crop else scale
+    cmd = [
+        'ffmpeg', '-nostats', '-threads', '1',
+        # Input-side seeks on both files; decoding from the keyframe keeps them frame-accurate
+        '-ss', f'{start:.3f}', '-t', f'{length:.3f}', '-i', str(encoded_path),
+        '-ss', f'{start:.3f}', '-t', f'{length:.3f}', '-i', str(source_path),
+        '-filter_complex',
+        f"[0:v]{scale}[distorted];[1:v]{reference}[reference];"
+        "[distorted]split[d1][d2];[reference]split[r1][r2];"
+        "[d1][r1]ssim;[d2][r2]psnr",
+        '-an', '-sn', '-dn',
+        '-f', 'null', '-'
+    ]
+    result = process.run_tool(cmd, 'qc', length)
+
+    ssim_match = SSIM_PATTERN.search(result.stderr)
+    psnr_match = PSNR_PATTERN.search(result.stderr)
+    ssim = float(ssim_match.group(1)) if ssim_match else None
+    psnr = float(psnr_match.group(1)) if psnr_match else None
+    return ssim, psnr
+
+@spans.timed()
+def run_fidelity_check(source_path, encoded_path, sample_count=4, sample_seconds=5,
+                       min_ssim=DEFAULT_MIN_SSIM, min_psnr=DEFAULT_MIN_PSNR,
+                       analysis_width=ANALYSIS_WIDTH, max_workers=None):
+    """
+    Compare a transcode against its source on evenly spaced, time-aligned windows
+    Args:
+        source_path (str): Original file
+        encoded_path (str): Transcoded file
+        sample_count (int): Number of windows
+        sample_seconds (float): Length of each window in seconds
+        min_ssim (float): Floor for the mean SSIM (All) across windows
+        min_psnr (float): Floor for the mean PSNR in dB across windows
+        analysis_width (int): Width both files are scaled to before comparing
+        max_workers (int): Concurrent window comparisons, defaults to one per core
+    Returns:
+        FidelityReport: report.passed is False if a floor was missed or nothing could be measured
+    Raises:
+        ProcessTimeout: A comparison or probe was killed by its time limit or stall watchdog
+    """
+    report = FidelityReport(encoded_path)
+    start = time.monotonic()
+
+    try:
+        _, duration = qc.probe_video_stream(encoded_path)
+        source_size = probe.probe_frame_size(source_path)
+        encoded_size = probe.probe_frame_size(encoded_path)
+        if not duration or not source_size or not encoded_size:
+            report.errors.append("could not probe source or transcode")
+            return report
+
+        # Analysis height follows the encode's aspect ratio, rounded to an even number
+        height = max(2, round(analysis_width * encoded_size[1] / encoded_size[0] / 2) * 2)
+        crop = reference_crop(source_size, encoded_size)
+        windows = qc.get_sample_windows(duration, sample_count, sample_seconds)
+        max_workers = max_workers or min(len(windows), os.cpu_count() or 1)
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='fidelity'
+        ) as executor:
+            results = list(executor.map(
+                lambda window: compare_window(source_path, encoded_path, window[0], window[1],
+                                              (analysis_width, height), crop),
+                windows
+            ))
+
+        ssims = [ssim for ssim, _ in results if ssim is not None]
+        psnrs = [psnr for _, psnr in results if psnr is not None]
+        report.windows = len(ssims)
+        if not ssims or not psnrs:
+            report.errors.append("no SSIM/PSNR measurements")
+            return report
+
+        report.ssim, report.worst_ssim = sum(ssims) / len(ssims), min(ssims)
+        report.psnr, report.worst_psnr = sum(psnrs) / len(psnrs), min(psnrs)
+        if report.ssim < min_ssim:
+            report.errors.append(f"SSIM {report.ssim:.4f} below {min_ssim}")
+        if report.psnr < min_psnr:
+            report.errors.append(f"PSNR {report.psnr:.2f} dB below {min_psnr} dB")
+
+    except process.ProcessKilled:
+        raise
+    except (subprocess.SubprocessError, OSError, ValueError) as e:
+        report.errors.append(f"error running fidelity check: {e}")
+    finally:
+        report.elapsed = time.monotonic() - start
+
+    return report
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python3 -m scripts.fidelity <source_file> <transcoded_file>")
+        sys.exit(1)
+
+    print(run_fidelity_check(sys.argv[1], sys.argv[2]))
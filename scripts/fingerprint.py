@@ -0,0 +1,42 @@
+import os
+import sys
+import hashlib
+from scripts import spans
+
+# Bytes read at the head, middle and tail of a file
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+@spans.timed()
+def content_fingerprint(path, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Identify a file by its size and three sampled blocks instead of hashing all of it.
+    Renamed or re-downloaded copies of one release get the same fingerprint, and the
+    cost is three reads whatever the file size.
+    Args:
+        path (str): File to fingerprint
+        block_size (int): Bytes sampled at each of the head, middle and tail
+    Returns:
+        str: Hex digest prefixed with the file size, e.g. '4831838208-5f1c...'
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        digest = hashlib.blake2b(size.to_bytes(8, 'little'), digest_size=16)
+        if size <= 3 * block_size:
+            offsets = [0]
+            block_size = size
+        else:
+            offsets = [0, (size - block_size) // 2, size - block_size]
+        for offset in offsets:
+            digest.update(os.pread(fd, block_size, offset))
+    finally:
+        os.close(fd)
+    return f"{size}-{digest.hexdigest()}"
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 -m scripts.fingerprint <media_file> [<media_file> ...]")
+        sys.exit(1)
+
+    for file_path in sys.argv[1:]:
+        print(f"{content_fingerprint(file_path)}  {file_path}")
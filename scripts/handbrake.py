@@ -1,17 +1,109 @@
-import subprocess
 import json
 import os
+import re
+import sys
+import time
+from collections import deque, namedtuple
 from pathlib import Path
 import logging
+try:
+    from scripts import process, spans
+except ImportError:  # Run directly as python3 scripts/handbrake.py
+    import process
+    import spans
 
-def transcode_video(input_file, output_file):
+# Used when no preset is given, e.g. from the command line
+DEFAULT_PRESET_PATH = Path(__file__).parent.parent / 'presets' / 'CPU_Encode.json'
+DEFAULT_PRESET_NAME = 'CPU_AV1'
+
+# "Encoding: task 1 of 2, 45.67 % (123.45 fps, avg 120.00 fps, ETA 00h12m34s)";
+# the rate and ETA are missing from the first updates of each pass
+PROGRESS_PATTERN = re.compile(
+    r'Encoding: task (\d+) of (\d+), ([\d.]+) %'
+    r'(?: \(([\d.]+) fps, avg ([\d.]+) fps, ETA (\d+)h(\d+)m(\d+)s\))?'
+)
+# Source duration from the title scan, e.g. "  + duration: 00:44:59.56"
+DURATION_PATTERN = re.compile(r'\+ duration: (\d+):(\d+):(\d+(?:\.\d+)?)')
+AVERAGE_SPEED_PATTERN = re.compile(r'average encoding speed for job is ([\d.]+) fps')
+# Crop found by the title scan, top/bottom/left/right, e.g. "  + autocrop: 132/132/0/0"
+AUTOCROP_PATTERN = re.compile(r'\+ autocrop: (\d+)/(\d+)/(\d+)/(\d+)')
+
+# Seconds between console progress updates, and between progress lines in the log
+CONSOLE_INTERVAL = 1.0
+LOG_INTERVAL = 60.0
+# HandBrake output kept to explain a failure
+ERROR_TAIL_LINES = 30
+
+# One progress update; percent covers all passes, fps/avg_fps/eta_seconds may be None
+EncodeProgress = namedtuple('EncodeProgress', ['task', 'task_count', 'percent', 'fps', 'avg_fps', 'eta_seconds'])
+
+def parse_progress(line):
+    """Return an EncodeProgress for a HandBrakeCLI progress line, or None for any other line"""
+    match = PROGRESS_PATTERN.search(line)
+    if not match:
+        return None
+
+    task, task_count = int(match.group(1)), int(match.group(2))
+    task_percent = float(match.group(3))
+    fps = avg_fps = eta_seconds = None
+    if match.group(4):
+        fps, avg_fps = float(match.group(4)), float(match.group(5))
+        hours, minutes, seconds = (int(match.group(i)) for i in (6, 7, 8))
+        eta_seconds = hours * 3600 + minutes * 60 + seconds
+    percent = ((task - 1) * 100 + task_percent) / max(task_count, 1)
+    return EncodeProgress(task, task_count, percent, fps, avg_fps, eta_seconds)
+
+def format_progress(name, progress):
+    text = f"{name}: {progress.percent:5.1f}% (pass {progress.task}/{progress.task_count}"
+    if progress.fps is not None:
+        minutes, seconds = divmod(progress.eta_seconds, 60)
+        text += (f", {progress.fps:.1f} fps, avg {progress.avg_fps:.1f} fps, "
+                 f"pass ETA {minutes // 60}h{minutes % 60:02d}m{seconds:02d}s")
+    return text + ")"
+
+def parse_duration(line):
+    """Return the source duration in seconds from a title scan line, or None"""
+    match = DURATION_PATTERN.search(line)
+    if not match:
+        return None
+    return int(match.group(1)) * 3600 + int(match.group(2)) * 60 + float(match.group(3))
+
+@spans.timed()
+def detect_crop(input_file):
+    """
+    Run a HandBrake title scan and return the crop it would apply automatically
+    Returns: (top, bottom, left, right) in pixels, or None if the scan failed
+    Raises: ProcessKilled if the scan was killed by its time limit or an interrupt
+    """
+    # The scan decodes only a few preview frames
+    result = process.run_tool(['HandBrakeCLI', '--input', str(input_file), '--scan'], 'probe', merge_stderr=True)
+    match = AUTOCROP_PATTERN.search(result.stdout or '')
+    if result.returncode != 0 or not match:
+        logging.warning(f"HandBrake scan found no crop for {Path(input_file).name}")
+        return None
+    return tuple(int(value) for value in match.groups())
+
+@spans.timed()
+def transcode_video(input_file, output_file, threads=None, echo_output=True,
+                    preset_path=None, preset_name=None, on_progress=None, video_only=False, duration=None,
+                    crop=None):
     """
     Transcode video using HandBrakeCLI with specified preset
     Args:
         input_file (str): Path to input video file
         output_file (str): Path to output video file
+        threads (int): Encoder threads for this job, or None to let SVT-AV1 use every core
+        echo_output (bool): Show a live progress line on the console
+        preset_path (str): Preset file to import (default: presets/CPU_Encode.json)
+        preset_name (str): Preset to use from that file (default: CPU_AV1)
+        on_progress (callable): Called with an EncodeProgress for every progress update
+        video_only (bool): Encode just the video, e.g. one segment of a chunked encode
+        duration (float): Source duration in seconds if known, sets the encode's time limit
+        crop (tuple): (top, bottom, left, right) to use instead of the preset's crop mode
     Returns:
-        bool: True if transcoding successful, False otherwise
+        dict: Final encode stats if transcoding succeeded, False otherwise
+    Raises:
+        ProcessTimeout: HandBrake ran past its time limit or stalled; the partial output is removed
     """
     try:
         input_path = Path(input_file)
@@ -29,10 +121,9 @@ def transcode_video(input_file, output_file):
             logging.error(f"Input file is empty: {input_file}")
             return False
         
-        # Get the project root directory
-        project_root = Path(__file__).parent.parent
-        preset_path = project_root / 'presets' / 'CPU_Encode.json'
-        
+        preset_path = Path(preset_path or DEFAULT_PRESET_PATH)
+        preset_name = preset_name or DEFAULT_PRESET_NAME
+
         if not preset_path.exists():
             logging.error(f"Preset file not found: {preset_path}")
             return False
@@ -43,44 +134,101 @@ def transcode_video(input_file, output_file):
             '--input', str(input_file),
             '--output', str(output_file),
             '--preset-import-file', str(preset_path),
-            '--preset', 'CPU_AV1',
+            '--preset', preset_name,
             '--format', 'av_mkv',
-            '--markers',
-            '--optimize',
-            '--all-audio',
-            '--all-subtitles'
         ]
+        if video_only:
+            cmd.extend(['--audio', 'none', '--subtitle', 'none'])
+        else:
+            cmd.extend(['--markers', '--optimize', '--all-audio', '--all-subtitles'])
+
+        if crop:
+            cmd.extend(['--crop', ':'.join(str(pixels) for pixels in crop)])
+
+        # Limit SVT-AV1's level of parallelism so concurrent jobs share the cores
+        if threads:
+            cmd.extend(['--encopts', f'lp={threads}'])
 
         logging.info(f"Starting transcode of: {input_path.name}")
         logging.info(f"Command: {' '.join(cmd)}")
         
-        # Run HandBrakeCLI
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            universal_newlines=True
-        )
-
-        # Print output in real-time
-        for line in process.stdout:
-            print(line, end='')
-
-        process.wait()
+        # Universal newlines turn HandBrake's carriage-return progress updates into lines
+        start = time.monotonic()
+        tail = deque(maxlen=ERROR_TAIL_LINES)
+        progress = scanned_duration = average_fps = None
+        last_console = last_log = start
+
+        def handle_line(line):
+            nonlocal progress, scanned_duration, average_fps, last_console, last_log
+            # Log lines on stderr can land on the end of an unterminated progress line
+            scanned_duration = scanned_duration or parse_duration(line)
+            speed_match = AVERAGE_SPEED_PATTERN.search(line)
+            if speed_match:
+                average_fps = float(speed_match.group(1))
+
+            update = parse_progress(line)
+            if update is None:
+                tail.append(line.rstrip())
+                return
+
+            progress = update
+            if on_progress:
+                on_progress(progress)
+
+            now = time.monotonic()
+            # Console updates rewrite one line (suppressed when several jobs share the console)
+            if echo_output and now - last_console >= CONSOLE_INTERVAL:
+                print(f"\r{format_progress(input_path.name, progress)}", end='', flush=True)
+                last_console = now
+            if now - last_log >= LOG_INTERVAL:
+                logging.info(format_progress(input_path.name, progress))
+                last_log = now
+
+        # Run HandBrakeCLI under the encode time limit and stall watchdog
+        try:
+            result = process.run_tool(cmd, 'encode', duration, on_line=handle_line, merge_stderr=True)
+        except process.ProcessKilled:
+            if echo_output and progress:
+                print()
+            if tail:
+                logging.error("HandBrake output ended with:\n" + '\n'.join(tail))
+            Path(output_file).unlink(missing_ok=True)
+            raise
+        duration = scanned_duration or duration
+
+        if echo_output and progress:
+            print()
         
-        if process.returncode != 0:
-            logging.error(f"HandBrake failed with return code: {process.returncode}")
+        if result.returncode != 0:
+            logging.error(f"HandBrake failed with return code: {result.returncode}")
+            logging.error("HandBrake output ended with:\n" + '\n'.join(tail))
             return False
-            
+
+        seconds = time.monotonic() - start
+        input_bytes = input_path.stat().st_size
+        output_bytes = Path(output_file).stat().st_size
+        stats = {
+            'file': input_path.name,
+            'preset': preset_name,
+            'seconds': round(seconds, 3),
+            'encode_fps': average_fps or (progress.avg_fps if progress else None),
+            'duration': duration,
+            'realtime_factor': round(duration / seconds, 3) if duration and seconds > 0 else None,
+            'input_bytes': input_bytes,
+            'output_bytes': output_bytes,
+            'size_ratio': round(output_bytes / input_bytes, 4),
+        }
         logging.info(f"Successfully transcoded: {input_path.name}")
-        return True
+        logging.info(f"Encode stats: {json.dumps(stats)}")
+        return stats
 
+    except process.ProcessKilled:
+        raise
     except Exception as e:
         logging.error(f"Error transcoding: {str(e)}")
         return False
 
 if __name__ == "__main__":
-    import sys
     if len(sys.argv) > 2:
         success = transcode_video(sys.argv[1], sys.argv[2])
         print(f"Transcoding {'succeeded' if success else 'failed'}")
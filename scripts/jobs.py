@@ -0,0 +1,69 @@
+import time
+from pathlib import Path
+from scripts import spans
+
+# Stages a file passes through, in order
+STAGES = ('discovered', 'renamed', 'transcoded', 'qc_passed', 'moved')
+
+class Job:
+    """
+    Everything the pipeline knows about one source file. Created at discovery
+    and handed from stage to stage, so no stage has to re-derive paths.
+    """
+
+    __slots__ = ('id', 'source_path', 'current_path', 'transcode_path', 'destination_path',
+                 'tv_info', 'media_info', 'decision', 'encode_stats', 'stage', 'status', 'error',
+                 'timings', 'fingerprint')
+
+    def __init__(self, job_id, source_path, current_path=None, transcode_path=None,
+                 stage='discovered', error=None, fingerprint=None):
+        self.id = job_id
+        self.source_path = Path(source_path)
+        self.current_path = Path(current_path or source_path)
+        self.transcode_path = Path(transcode_path) if transcode_path else None
+        self.destination_path = None
+        self.tv_info = None
+        # Probe results and the skip / remux / transcode decision made before Stage 2
+        self.media_info = None
+        self.decision = None
+        # Final stats reported by the encoder, if this run encoded the job
+        self.encode_stats = None
+        self.stage = stage
+        self.status = 'pending'
+        self.error = error
+        # Seconds spent in each stage during this run
+        self.timings = {}
+        # Content identity of the source, see scripts.fingerprint
+        self.fingerprint = fingerprint
+
+    def __repr__(self):
+        return (f"Job(id={self.id}, current_path={str(self.current_path)!r}, "
+                f"stage={self.stage!r}, status={self.status!r})")
+
+    def reached(self, stage):
+        """Return True if the job has reached (or passed) the given stage"""
+        return STAGES.index(self.stage) >= STAGES.index(stage)
+
+    def timed(self, stage):
+        """Context manager that records how long a block took under timings[stage]"""
+        return StageTimer(self, stage)
+
+class StageTimer:
+    """Adds the wall time of a with-block to a job's timings and to the run's stage.<name> span"""
+
+    __slots__ = ('job', 'stage', 'start')
+
+    def __init__(self, job, stage):
+        self.job = job
+        self.stage = stage
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self.job
+
+    def __exit__(self, *exc):
+        elapsed = time.monotonic() - self.start
+        self.job.timings[self.stage] = self.job.timings.get(self.stage, 0.0) + elapsed
+        spans.record(f"stage.{self.stage}", elapsed)
+        return False
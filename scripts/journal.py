@@ -0,0 +1,271 @@
+import sqlite3
+import logging
+import pickle
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+from scripts.jobs import Job, STAGES
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source_path TEXT NOT NULL UNIQUE,
+    current_path TEXT NOT NULL,
+    transcode_path TEXT,
+    stage TEXT NOT NULL,
+    error TEXT,
+    error_kind TEXT,
+    failures INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    fingerprint TEXT,
+    duplicate_of INTEGER,
+    source_size INTEGER,
+    source_mtime_ns INTEGER
+);
+CREATE INDEX IF NOT EXISTS jobs_current_path ON jobs (current_path);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Columns added after the first release, created on journals that predate them
+ADDED_COLUMNS = (('fingerprint', 'TEXT'), ('duplicate_of', 'INTEGER'), ('error_kind', 'TEXT'),
+                 ('failures', 'INTEGER NOT NULL DEFAULT 0'), ('source_size', 'INTEGER'),
+                 ('source_mtime_ns', 'INTEGER'))
+
+# The error a job's last attempt ended with; failures counts every recorded error
+JobFailure = namedtuple('JobFailure', ['error', 'kind', 'failed_at', 'failures'])
+
+def job_from_row(row):
+    """Build a Job from a jobs table row"""
+    return Job(row['id'], row['source_path'], row['current_path'], row['transcode_path'],
+               row['stage'], row['error'], row['fingerprint'])
+
+class JobJournal:
+    """
+    SQLite-backed record of the stage each source file has reached.
+    Every update is a single-row write in its own transaction, so a crash
+    never loses more than the stage that was in flight.
+    """
+
+    def __init__(self, db_path='.jobs.db'):
+        self.db_path = str(db_path)
+        self._lock = threading.Lock()
+        # Shared between pipeline threads; access is serialised by self._lock
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        columns = {row['name'] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, column_type in ADDED_COLUMNS:
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_fingerprint ON jobs (fingerprint)")
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _find_row(self, path):
+        path = str(path)
+        with self._lock:
+            return self._conn.execute(
+                "SELECT * FROM jobs WHERE source_path = ? OR current_path = ? "
+                "ORDER BY id DESC LIMIT 1",
+                (path, path)
+            ).fetchone()
+
+    def find(self, path):
+        """Look up a job by its original or current path"""
+        row = self._find_row(path)
+        return job_from_row(row) if row else None
+
+    def discover(self, path, size=None, mtime_ns=None, fingerprint=None):
+        """
+        Return the job for a path, creating it at the 'discovered' stage if new.
+        A recorded job is only trusted while the file on disk is still the one it saw;
+        a file replaced at the same path (e.g. a re-downloaded episode) starts the job over.
+        Args:
+            path (str): Source file
+            size (int): Its size in bytes, or None to match on the path alone
+            mtime_ns (int): Its modification time
+            fingerprint (callable): Returns the file's content fingerprint, tried when
+                size or mtime changed, so a file that was only touched keeps its job
+        """
+        row = self._find_row(path)
+        if row is None:
+            path = str(path)
+            with self._lock, self._conn:
+                cursor = self._conn.execute(
+                    "INSERT INTO jobs (source_path, current_path, stage, source_size, source_mtime_ns, updated_at) "
+                    "VALUES (?, ?, 'discovered', ?, ?, ?)",
+                    (path, path, size, mtime_ns, time.time())
+                )
+                job_id = cursor.lastrowid
+            return Job(job_id, path)
+
+        job = job_from_row(row)
+        if size is None or (row['source_size'], row['source_mtime_ns']) == (size, mtime_ns):
+            return job
+        if row['source_size'] is None:
+            # Recorded before sizes were kept. Sources are deleted once their output is
+            # moved, so a file back at a finished job's path is a new one
+            same = not (row['stage'] == 'moved' and row['error'] is None and row['duplicate_of'] is None)
+        elif row['fingerprint'] and fingerprint:
+            try:
+                same = fingerprint() == row['fingerprint']
+            except OSError as e:
+                logging.warning(f"Could not fingerprint {path}: {e}")
+                same = False
+        else:
+            same = False
+
+        if same:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "UPDATE jobs SET source_size = ?, source_mtime_ns = ? WHERE id = ?",
+                    (size, mtime_ns, job.id)
+                )
+            return job
+
+        logging.info(f"{path} is not the file job {job.id} recorded ({job.stage}), starting it over")
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET current_path = ?, transcode_path = NULL, stage = 'discovered', error = NULL, "
+                "error_kind = NULL, failures = 0, fingerprint = NULL, duplicate_of = NULL, source_size = ?, "
+                "source_mtime_ns = ?, updated_at = ? WHERE id = ?",
+                (str(path), size, mtime_ns, time.time(), job.id)
+            )
+        return Job(job.id, job.source_path, path)
+
+    def advance(self, job, stage, **paths):
+        """
+        Record that a job reached a stage, updating the Job as well
+        Args:
+            job (Job): Job returned by discover/find
+            stage (str): One of STAGES
+            **paths: Optional current_path / transcode_path updates
+        """
+        if stage not in STAGES:
+            raise ValueError(f"Unknown stage: {stage}")
+
+        for key, value in paths.items():
+            setattr(job, key, Path(value))
+        job.stage = stage
+        job.error = None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET stage = ?, current_path = ?, transcode_path = ?, "
+                "error = NULL, error_kind = NULL, updated_at = ? WHERE id = ?",
+                (stage, str(job.current_path),
+                 str(job.transcode_path) if job.transcode_path else None,
+                 time.time(), job.id)
+            )
+
+    def record_error(self, job, error, status='failed'):
+        """
+        Record why a job failed without changing the stage it will resume from
+        Args:
+            job (Job): Failed job
+            error (str): Reason, stored in the journal
+            status (str): 'failed', or a more specific category such as 'timeout'; stored as error_kind
+        """
+        job.error = str(error)
+        job.status = status
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET error = ?, error_kind = ?, failures = failures + 1, updated_at = ? WHERE id = ?",
+                (job.error, status, time.time(), job.id)
+            )
+
+    def last_failure(self, job):
+        """
+        The error a job is currently held at
+        Returns: JobFailure, or None if its last attempt did not fail
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT error, error_kind, updated_at, failures FROM jobs WHERE id = ? AND error IS NOT NULL",
+                (job.id,)
+            ).fetchone()
+        return JobFailure(row['error'], row['error_kind'], row['updated_at'], row['failures']) if row else None
+
+    def set_fingerprint(self, job, fingerprint):
+        """Store the content fingerprint of a job's source"""
+        job.fingerprint = fingerprint
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET fingerprint = ?, updated_at = ? WHERE id = ?",
+                (fingerprint, time.time(), job.id)
+            )
+
+    def find_processed(self, fingerprint, exclude_id=None):
+        """
+        Look up a job with this fingerprint whose file reached the library
+        Returns: Job, or None if this content was never processed
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE fingerprint = ? AND stage = 'moved' AND duplicate_of IS NULL "
+                "AND error IS NULL AND id != ? ORDER BY id LIMIT 1",
+                (fingerprint, exclude_id if exclude_id is not None else -1)
+            ).fetchone()
+        return job_from_row(row) if row else None
+
+    def mark_duplicate(self, job, original):
+        """Retire a job whose content was already processed as original; its source is left in place"""
+        job.stage = 'moved'
+        job.status = 'duplicate'
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET stage = 'moved', duplicate_of = ?, updated_at = ? WHERE id = ?",
+                (original.id, time.time(), job.id)
+            )
+
+    def retire(self, job, reason, status='retired'):
+        """
+        Close a job that will never be moved, e.g. because the library keeps its own copy.
+        It is marked 'moved' with the reason as its error, so later runs drop it; its source is left in place.
+        """
+        job.stage = 'moved'
+        job.error = str(reason)
+        job.status = status
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET stage = 'moved', error = ?, error_kind = ?, updated_at = ? WHERE id = ?",
+                (job.error, status, time.time(), job.id)
+            )
+
+    def migrate_pickle(self, progress_path='.progress.pkl'):
+        """
+        One-time import of the legacy pickled set of finished files.
+        The pickle is left where it is; the journal records that it was imported,
+        so the import never runs twice.
+        Returns: Number of files imported
+        """
+        progress_path = Path(progress_path)
+        meta_key = f"migrated:{progress_path.resolve()}"
+        if not progress_path.exists():
+            return 0
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM meta WHERE key = ?", (meta_key,)).fetchone():
+                return 0
+
+        with open(progress_path, 'rb') as f:
+            processed_files = pickle.load(f)
+
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO jobs (source_path, current_path, stage, updated_at) "
+                "VALUES (?, ?, 'moved', ?)",
+                [(path, path, now) for path in processed_files]
+            )
+            self._conn.execute("INSERT INTO meta (key, value) VALUES (?, ?)", (meta_key, str(now)))
+
+        logging.info(f"Migrated {len(processed_files)} finished file(s) from {progress_path}")
+        return len(processed_files)
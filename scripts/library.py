@@ -0,0 +1,137 @@
+import os
+import sys
+import time
+import logging
+import threading
+from pathlib import Path
+from scripts import scan, spans
+
+INDEX_PATH = '.library_index.db'
+# External changes to the library are picked up at most this long after they happen
+DEFAULT_REFRESH_SECONDS = 600
+
+POLICIES = ('skip', 'replace_if_larger', 'keep_both')
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+def title_key(path):
+    """Library key of a path: its extension is ignored, so S01E02.mp4 and S01E02.mkv collide"""
+    return os.path.splitext(os.path.normpath(str(path)))[0]
+
+class LibraryIndex:
+    """
+    In-memory view of the media files already in the library directories, so a job's
+    planned destination can be checked with one dict lookup. It is filled from a
+    ScanIndex of its own, so a refresh only lists the directories whose mtime changed.
+    """
+
+    def __init__(self, roots, db_path=INDEX_PATH, refresh_seconds=DEFAULT_REFRESH_SECONDS):
+        self.roots = [str(root) for root in roots]
+        self.db_path = str(db_path)
+        self.refresh_seconds = refresh_seconds
+        self._entries = {}
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    @spans.timed()
+    def refresh(self, full_rescan=False):
+        """Re-read the library directories, listing only the ones that changed"""
+        entries = {}
+        with self._refresh_lock:
+            scan_index = scan.ScanIndex(self.db_path)
+            try:
+                for root in self.roots:
+                    for entry in scan.iter_media_files(root, scan_index, full_rescan):
+                        entries[title_key(entry.path)] = entry
+            finally:
+                scan_index.close()
+
+            with self._lock:
+                self._entries = entries
+                self._refreshed_at = time.monotonic()
+
+    def lookup(self, path):
+        """
+        Find the library file a planned destination would collide with
+        Returns: ScanEntry (path, size, mtime_ns) of the existing file, or None
+        """
+        if self._refreshed_at is None or time.monotonic() - self._refreshed_at > self.refresh_seconds:
+            self.refresh()
+        with self._lock:
+            entry = self._entries.get(title_key(path))
+        # The index can lag behind deletions made outside the pipeline
+        if entry and not os.path.exists(entry.path):
+            self.discard(entry.path)
+            return None
+        return entry
+
+    def add(self, path, size):
+        """Record a file the pipeline just moved into the library"""
+        with self._lock:
+            self._entries[title_key(path)] = scan.ScanEntry(str(path), size, time.time_ns())
+
+    def discard(self, path):
+        with self._lock:
+            self._entries.pop(title_key(path), None)
+
+    def free_path(self, path):
+        """First of 'name (2).ext', 'name (3).ext', ... that is neither indexed nor on disk"""
+        path = Path(path)
+        copy = 2
+        while True:
+            candidate = path.with_name(f"{path.stem} ({copy}){path.suffix}")
+            with self._lock:
+                taken = title_key(candidate) in self._entries
+            if not taken and not candidate.exists():
+                return candidate
+            copy += 1
+
+def resolve_destination(index, planned_path, policy='skip', new_size=None):
+    """
+    Decide what to do with a file headed for planned_path
+    Args:
+        index (LibraryIndex): Index of the library
+        planned_path (Path): Where the pipeline would put the file
+        policy (str): 'skip', 'replace_if_larger' or 'keep_both'
+        new_size (int): Size of the new file, None while it has not been encoded yet
+    Returns:
+        tuple: (action, path, existing) where action is 'new' (move to path), 'skip'
+            (keep the library copy), 'replace' (move to path, then remove existing if it is
+            another file) or 'keep_both' (move to the free path alongside existing)
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown library policy: {policy} (expected one of {', '.join(POLICIES)})")
+
+    planned_path = Path(planned_path)
+    existing = index.lookup(planned_path)
+    if existing is None:
+        return 'new', planned_path, None
+    if policy == 'keep_both':
+        return 'keep_both', index.free_path(planned_path), existing
+    if policy == 'replace_if_larger' and (new_size is None or existing.size > new_size):
+        return 'replace', planned_path, existing
+    return 'skip', planned_path, existing
+
+def get_default_index(roots, db_path=INDEX_PATH, refresh_seconds=DEFAULT_REFRESH_SECONDS):
+    """Open the shared library index on first use"""
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = LibraryIndex(roots, db_path, refresh_seconds)
+        return _default_index
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 -m scripts.library <library_directory> [<library_directory> ...]")
+        sys.exit(1)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    library_index = LibraryIndex(sys.argv[1:])
+    library_index.refresh()
+    print(f"{len(library_index)} title(s) in the library")
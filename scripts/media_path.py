@@ -0,0 +1,145 @@
+import os
+import re
+import sys
+from collections import namedtuple
+from functools import lru_cache
+
+# Parsed TV episode location; season and episode are ints
+TVInfo = namedtuple('TVInfo', ['show', 'season', 'episode'])
+
+SEASON_DIR_PATTERN = re.compile(r'season\s*(\d+)', re.IGNORECASE)
+
+SEASON_PATTERNS = (
+    re.compile(r'Season\s*(\d{1,2})', re.IGNORECASE),            # Matches "Season 4" in directory
+    re.compile(r'[Ss](\d{1,2})[Ee]\d{1,2}', re.IGNORECASE),      # Matches "S4E1"
+    re.compile(r'season\s*(\d{1,2})\s*episode', re.IGNORECASE),  # Matches "season 1 episode"
+)
+
+EPISODE_PATTERNS = (
+    re.compile(r'[Ee](\d{1,2})', re.IGNORECASE),                 # Matches "E1"
+    re.compile(r'[Ss]\d{1,2}[Ee](\d{1,2})', re.IGNORECASE),       # Matches "S4E1"
+    re.compile(r'episode\s*(\d{1,2})', re.IGNORECASE),           # Matches "episode 1"
+)
+
+SHOW_IN_FILENAME_PATTERN = re.compile(r'(.+?)(?:\s+[Ss]eason|\s+[Ss]\d)', re.IGNORECASE)
+SEPARATOR_PATTERN = re.compile(r'[._]')
+
+# Enough for every directory / file of a large library; entries are tiny tuples
+DIR_CACHE_SIZE = 1 << 16
+PATH_CACHE_SIZE = 1 << 18
+
+def split_dir(dir_path):
+    """Return (parent, name) for a directory path, or (None, name) at the top"""
+    parent, name = os.path.split(dir_path)
+    if not name:
+        # Trailing separator or filesystem root
+        return None, ''
+    return (parent if parent and parent != dir_path else None), name
+
+def first_match(patterns, text):
+    """Return the first group of the first pattern that matches text, or None"""
+    for pattern in patterns:
+        match = pattern.search(text)
+        if match:
+            return match.group(1)
+    return None
+
+@lru_cache(maxsize=DIR_CACHE_SIZE)
+def resolve_season_dir(dir_path):
+    """
+    Find the nearest "Season N" directory at or above dir_path
+    Returns: (show_name, season_num) or None; season_num is None if the
+    directory has no number in it
+    """
+    parent, name = split_dir(dir_path)
+    if name.lower().startswith('season '):
+        season_match = SEASON_DIR_PATTERN.search(name)
+        show_name = split_dir(parent)[1] if parent else ''
+        return show_name, int(season_match.group(1)) if season_match else None
+    if parent is None:
+        return None
+    return resolve_season_dir(parent)
+
+@lru_cache(maxsize=DIR_CACHE_SIZE)
+def resolve_show_dirs(dir_path):
+    """
+    Loose show/season lookup used when renaming downloads
+    Returns: (show_name, season) from the directory names alone, either may be None
+    """
+    parent, name = split_dir(dir_path)
+    inherited_show, inherited_season = resolve_show_dirs(parent) if parent else (None, None)
+
+    # The nearest directory wins, so this level overrides anything inherited
+    show_name = inherited_show
+    if name.lower().startswith('season') and parent:
+        show_name = split_dir(parent)[1] or inherited_show
+    season = first_match(SEASON_PATTERNS, name) or inherited_season
+    return show_name, season
+
+def parse_episode(filename):
+    """Return the episode number found in a filename, or None"""
+    episode = first_match(EPISODE_PATTERNS, filename)
+    return int(episode) if episode else None
+
+@lru_cache(maxsize=PATH_CACHE_SIZE)
+def parse_tv_show(file_path):
+    """
+    Parse TV show information from a "<Show>/Season N/<episode>" path without touching the disk
+    Returns: TVInfo(show, season, episode) or None if not a TV show
+    """
+    dir_path, filename = os.path.split(os.fspath(file_path))
+    season_dir = resolve_season_dir(dir_path) if dir_path else None
+    if not season_dir:
+        return None
+
+    show_name, season_num = season_dir
+    if not show_name or not season_num:
+        return None
+
+    episode_num = parse_episode(filename)
+    if not episode_num:
+        return None
+
+    return TVInfo(show_name, season_num, episode_num)
+
+def extract_tv_info(file_path):
+    """
+    Extract TV show information from looser download layouts, falling back to the filename
+    Returns: TVInfo(show, season, episode) or None
+    """
+    dir_path, filename = os.path.split(os.fspath(file_path))
+    show_name, season = resolve_show_dirs(dir_path) if dir_path else (None, None)
+
+    if not show_name:
+        # Try to extract from filename
+        filename_match = SHOW_IN_FILENAME_PATTERN.match(os.path.splitext(filename)[0])
+        if filename_match:
+            show_name = filename_match.group(1)
+
+    # Clean up show name
+    if show_name:
+        show_name = SEPARATOR_PATTERN.sub(' ', show_name).strip()
+
+    # If not found in directory, check filename
+    if not season:
+        season = first_match(SEASON_PATTERNS, filename)
+
+    episode = first_match(EPISODE_PATTERNS, filename)
+
+    if show_name and season and episode:
+        return TVInfo(show_name, int(season), int(episode))
+    return None
+
+def clear_caches():
+    """Forget cached directory resolutions, e.g. after directories are renamed"""
+    resolve_season_dir.cache_clear()
+    resolve_show_dirs.cache_clear()
+    parse_tv_show.cache_clear()
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 -m scripts.media_path <file_path> [<file_path> ...]")
+        sys.exit(1)
+
+    for path in sys.argv[1:]:
+        print(f"{path}: {parse_tv_show(path) or extract_tv_info(path)}")
@@ -0,0 +1,180 @@
+import os
+import sys
+import time
+import fcntl
+import errno
+import hashlib
+import logging
+import concurrent.futures
+from pathlib import Path
+from scripts import spans
+
+# ioctl request for FICLONE (_IOW(0x94, 9, int)) on Linux reflink-capable filesystems
+FICLONE = 0x40049409
+COPY_CHUNK = 64 * 1024 * 1024
+HASH_CHUNK = 8 * 1024 * 1024
+
+def same_device(source_path, dest_dir):
+    """Return True if a rename from source_path into dest_dir stays on one filesystem"""
+    return os.stat(source_path).st_dev == os.stat(dest_dir).st_dev
+
+def try_reflink(src_fd, dst_fd):
+    """Clone the file's extents (btrfs, XFS, ...); returns False where unsupported"""
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        return True
+    except OSError:
+        return False
+
+def copy_fd(src_fd, dst_fd, size):
+    """
+    Copy size bytes between file descriptors inside the kernel where possible
+    Tries copy_file_range, then sendfile, then a plain read/write loop.
+    Returns: Name of the method that was used
+    """
+    copied = 0
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while copied < size:
+                sent = os.copy_file_range(src_fd, dst_fd, min(COPY_CHUNK, size - copied))
+                if sent == 0:
+                    break
+                copied += sent
+            if copied == size:
+                return 'copy_file_range'
+        except OSError as e:
+            # Cross-filesystem copy_file_range is refused on older kernels
+            if e.errno not in (errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP):
+                raise
+
+    if hasattr(os, 'sendfile') and sys.platform.startswith('linux'):
+        try:
+            while copied < size:
+                sent = os.sendfile(dst_fd, src_fd, copied, min(COPY_CHUNK, size - copied))
+                if sent == 0:
+                    break
+                copied += sent
+            if copied == size:
+                return 'sendfile'
+        except OSError as e:
+            if e.errno not in (errno.EINVAL, errno.ENOSYS):
+                raise
+
+    os.lseek(src_fd, copied, os.SEEK_SET)
+    os.lseek(dst_fd, copied, os.SEEK_SET)
+    while copied < size:
+        chunk = os.read(src_fd, COPY_CHUNK)
+        if not chunk:
+            break
+        os.write(dst_fd, chunk)
+        copied += len(chunk)
+    return 'read/write'
+
+@spans.timed()
+def file_checksum(path):
+    """BLAKE2b digest of a whole file, read in large sequential chunks"""
+    digest = hashlib.blake2b(digest_size=32)
+    with open(path, 'rb') as f:
+        while chunk := f.read(HASH_CHUNK):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def fsync_dir(dir_path):
+    """Flush a directory entry so a rename survives power loss"""
+    fd = os.open(dir_path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+@spans.timed()
+def move_file(source_path, dest_path, reflink=True, fsync=True, verify_checksum=False):
+    """
+    Move a file, renaming atomically on one filesystem and copying in-kernel across filesystems
+    Args:
+        source_path (str): File to move
+        dest_path (str): Final path; its directory must exist
+        reflink (bool): Try a copy-on-write clone before copying data
+        fsync (bool): Flush the copy (and directory entries) before the source is removed
+        verify_checksum (bool): Compare full-file checksums after a cross-device copy
+    Returns:
+        dict: Move stats (method, bytes, seconds, mb_per_second)
+    Raises:
+        OSError: If the move or its verification fails; the source is left untouched
+    """
+    source_path, dest_path = Path(source_path), Path(dest_path)
+    size = source_path.stat().st_size
+    start = time.monotonic()
+
+    if same_device(source_path, dest_path.parent):
+        os.replace(source_path, dest_path)
+        method = 'rename'
+    else:
+        # Copy next to the destination, then rename into place so readers never see a partial file
+        partial_path = dest_path.with_name(dest_path.name + '.partial')
+        try:
+            src_fd = os.open(source_path, os.O_RDONLY)
+            try:
+                dst_fd = os.open(partial_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                try:
+                    method = 'reflink' if reflink and try_reflink(src_fd, dst_fd) else copy_fd(src_fd, dst_fd, size)
+                    if fsync:
+                        os.fsync(dst_fd)
+                finally:
+                    os.close(dst_fd)
+            finally:
+                os.close(src_fd)
+
+            copied_size = partial_path.stat().st_size
+            if copied_size != size:
+                raise OSError(errno.EIO, f"size mismatch after copy ({copied_size} != {size} bytes)")
+            if verify_checksum and file_checksum(source_path) != file_checksum(partial_path):
+                raise OSError(errno.EIO, "checksum mismatch after copy")
+
+            os.replace(partial_path, dest_path)
+        except BaseException:
+            partial_path.unlink(missing_ok=True)
+            raise
+
+        if fsync:
+            fsync_dir(dest_path.parent)
+        source_path.unlink()
+
+    seconds = time.monotonic() - start
+    mb_per_second = size / (1024 * 1024) / seconds if seconds > 0 else float('inf')
+    logging.info(f"Moved {source_path.name} via {method}: {size / (1024 * 1024):.1f} MiB "
+                 f"in {seconds:.2f}s ({mb_per_second:.1f} MiB/s)")
+    return {'method': method, 'bytes': size, 'seconds': seconds, 'mb_per_second': mb_per_second}
+
+class BackgroundMover:
+    """Single I/O thread that performs moves so encode and QC workers never wait on them"""
+
+    def __init__(self, max_workers=1):
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='mover'
+        )
+
+    def submit(self, func, *args, **kwargs):
+        """Queue a move (or a callable that performs one) and return its future"""
+        return self._executor.submit(func, *args, **kwargs)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        return False
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python3 -m scripts.mover <source_file> <destination_file> [--verify]")
+        sys.exit(1)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    print(move_file(sys.argv[1], sys.argv[2], verify_checksum='--verify' in sys.argv))
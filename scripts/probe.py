@@ -0,0 +1,214 @@
+import subprocess
+import json
+import logging
+import sys
+from pathlib import Path
+try:
+    from scripts import process, spans
+except ImportError:  # Imported from a script run directly, e.g. python3 scripts/chunked.py
+    import process
+    import spans
+
+# Defaults for the pre-transcode decision; each can be overridden in config.json
+DEFAULT_SKIP_CODECS = ('av1',)
+DEFAULT_REMUX_CODECS = ('hevc',)
+DEFAULT_REMUX_MAX_BPP = 0.06
+
+class MediaInfo:
+    """The parts of an ffprobe report the pipeline makes decisions on"""
+
+    __slots__ = ('path', 'container', 'duration', 'size', 'bit_rate', 'video_codec',
+                 'width', 'height', 'fps', 'audio_streams', 'subtitle_streams')
+
+    def __init__(self, path):
+        self.path = str(path)
+        self.container = ''
+        self.duration = None
+        self.size = None
+        self.bit_rate = None
+        self.video_codec = None
+        self.width = None
+        self.height = None
+        self.fps = None
+        self.audio_streams = 0
+        self.subtitle_streams = 0
+
+    def __repr__(self):
+        return (f"MediaInfo(path={self.path!r}, container={self.container!r}, "
+                f"video_codec={self.video_codec!r}, {self.width}x{self.height}, "
+                f"fps={self.fps}, duration={self.duration}, bit_rate={self.bit_rate})")
+
+    @property
+    def is_matroska(self):
+        return 'matroska' in self.container
+
+    @property
+    def pixels(self):
+        return (self.width or 0) * (self.height or 0)
+
+    @property
+    def bits_per_pixel(self):
+        """Video bits spent per pixel per frame, or None if the stream is missing details"""
+        if not (self.bit_rate and self.pixels and self.fps):
+            return None
+        return self.bit_rate / (self.pixels * self.fps)
+
+def parse_rate(rate):
+    """Turn an ffprobe rate like '24000/1001' into a float"""
+    try:
+        num, _, den = str(rate).partition('/')
+        return float(num) / float(den or 1) if float(den or 1) else None
+    except ValueError:
+        return None
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+@spans.timed()
+def probe_media(file_path):
+    """
+    Read container and stream details with ffprobe
+    Args:
+        file_path (str): Path to media file
+    Returns:
+        MediaInfo: Parsed details, or None if ffprobe failed
+    Raises:
+        ProcessKilled: ffprobe was killed by its time limit or an interrupt, which is not a probe failure
+    """
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-show_entries',
+        'format=format_name,duration,size,bit_rate:'
+        'stream=codec_type,codec_name,width,height,avg_frame_rate,bit_rate',
+        '-of', 'json',
+        str(file_path)
+    ]
+
+    try:
+        result = process.run_tool(cmd, 'probe')
+        if result.returncode != 0:
+            logging.error(f"FFprobe error: {result.stderr}")
+            return None
+        data = json.loads(result.stdout or '{}')
+    except process.ProcessKilled:
+        raise
+    except (subprocess.SubprocessError, OSError, ValueError) as e:
+        logging.error(f"Error probing {file_path}: {e}")
+        return None
+
+    info = MediaInfo(file_path)
+    fmt = data.get('format', {})
+    info.container = fmt.get('format_name', '')
+    info.duration = to_float(fmt.get('duration'))
+    info.size = int(to_float(fmt.get('size')) or 0) or None
+    format_bit_rate = to_float(fmt.get('bit_rate'))
+
+    for stream in data.get('streams', []):
+        codec_type = stream.get('codec_type')
+        if codec_type == 'video' and info.video_codec is None:
+            info.video_codec = stream.get('codec_name')
+            info.width = stream.get('width')
+            info.height = stream.get('height')
+            info.fps = parse_rate(stream.get('avg_frame_rate'))
+            # Matroska rarely carries a per-stream bitrate; the container total is close enough
+            info.bit_rate = to_float(stream.get('bit_rate')) or format_bit_rate
+        elif codec_type == 'audio':
+            info.audio_streams += 1
+        elif codec_type == 'subtitle':
+            info.subtitle_streams += 1
+
+    return info
+
+def probe_duration(file_path):
+    """Container duration in seconds, or None"""
+    info = probe_media(file_path)
+    return info.duration if info else None
+
+def probe_frame_size(file_path):
+    """(width, height) of the first video stream, or None"""
+    info = probe_media(file_path)
+    if not info or not info.width or not info.height:
+        return None
+    return int(info.width), int(info.height)
+
+def classify(info, skip_codecs=DEFAULT_SKIP_CODECS, remux_codecs=DEFAULT_REMUX_CODECS,
+             remux_max_bpp=DEFAULT_REMUX_MAX_BPP):
+    """
+    Decide how a source should be processed
+    Args:
+        info (MediaInfo): Probed source
+        skip_codecs (iterable): Codecs that never need re-encoding
+        remux_codecs (iterable): Efficient codecs kept as-is when already at a low bitrate
+        remux_max_bpp (float): Bits per pixel at or below which remux_codecs are kept
+    Returns:
+        tuple: (decision, reason) where decision is 'skip', 'remux' or 'transcode'
+    """
+    if info is None or not info.video_codec:
+        return 'transcode', "no probe data"
+
+    codec = info.video_codec.lower()
+    if codec in skip_codecs:
+        if info.is_matroska:
+            return 'skip', f"already {codec} in Matroska"
+        return 'remux', f"already {codec}, only the container changes"
+
+    bpp = info.bits_per_pixel
+    if codec in remux_codecs and bpp is not None and bpp <= remux_max_bpp:
+        return 'remux', f"{codec} at {bpp:.3f} bits/pixel is already efficient"
+
+    return 'transcode', f"{codec} at {bpp:.3f} bits/pixel" if bpp is not None else codec
+
+@spans.timed()
+def remux_to_mkv(input_file, output_file, duration=None):
+    """
+    Copy every stream into a Matroska container without re-encoding
+    Args:
+        input_file (str): Source file
+        output_file (str): Destination .mkv
+        duration (float): Source duration in seconds if known, sets the time limit
+    Returns:
+        bool: True if the remux succeeded
+    Raises:
+        ProcessTimeout: ffmpeg ran past its time limit or stalled; the partial output is removed
+    """
+    cmd = [
+        'ffmpeg',
+        '-nostats',
+        '-y',
+        '-i', str(input_file),
+        '-map', '0',
+        '-c', 'copy',
+    ]
+    # MP4 text subtitles (mov_text) cannot be stored in Matroska as-is
+    if Path(input_file).suffix.lower() in ('.mp4', '.mov', '.m4v'):
+        cmd.extend(['-c:s', 'srt'])
+    cmd.extend(['-f', 'matroska', str(output_file)])
+
+    logging.info(f"Remuxing {input_file} -> {output_file}")
+    try:
+        result = process.run_tool(cmd, 'mux', duration)
+    except process.ProcessKilled:
+        Path(output_file).unlink(missing_ok=True)
+        raise
+    except (subprocess.SubprocessError, OSError) as e:
+        logging.error(f"Error running ffmpeg remux: {e}")
+        return False
+
+    if result.returncode != 0:
+        logging.error(f"Remux failed with return code {result.returncode}: {result.stderr[-2000:]}")
+        Path(output_file).unlink(missing_ok=True)
+        return False
+    return True
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 -m scripts.probe <media_file>")
+        sys.exit(1)
+
+    media_info = probe_media(sys.argv[1])
+    print(media_info)
+    print(classify(media_info))
@@ -0,0 +1,253 @@
+import os
+import sys
+import time
+import signal
+import shutil
+import logging
+import threading
+import subprocess
+from collections import namedtuple
+try:
+    from scripts import spans
+except ImportError:  # Imported from a script run directly, e.g. python3 scripts/handbrake.py
+    import spans
+
+# Limits and priority for one class of tool:
+#   wall limit      base_seconds + seconds_per_media_second * media duration; when the limit
+#                   scales with duration and the duration is unknown, only the stall check applies
+#   stall_seconds   kill the tool after this long without any output (None to disable)
+#   nice            CPU niceness, 0 to leave as is
+#   ionice_class    1 realtime, 2 best-effort, 3 idle, None to leave as is
+ToolLimits = namedtuple('ToolLimits', ['base_seconds', 'seconds_per_media_second', 'stall_seconds',
+                                       'nice', 'ionice_class', 'ionice_level'])
+
+DEFAULT_LIMITS = {
+    # ffprobe reads headers only
+    'probe': ToolLimits(120, 0, None, 0, None, None),
+    # Remux, split and join copy streams at disk speed
+    'mux': ToolLimits(600, 0.5, 600, 5, 2, 7),
+    # Decode-only checks must never starve the encoders
+    'qc': ToolLimits(600, 2.0, 300, 10, 2, 7),
+    # Slow AV1 presets can run well below realtime; HandBrake reports progress constantly
+    'encode': ToolLimits(1800, 30.0, 900, 0, None, None),
+}
+
+# Seconds between SIGTERM and SIGKILL when a tool is stopped
+KILL_GRACE_SECONDS = 10
+POLL_SECONDS = 1.0
+
+_limits = dict(DEFAULT_LIMITS)
+_active = {}
+_active_lock = threading.Lock()
+
+# Set by the interrupt handler; no tool starts after it, and workers stop taking jobs
+interrupted = threading.Event()
+
+class ProcessKilled(subprocess.SubprocessError):
+    """An external tool was killed by the pipeline rather than failing on its own"""
+
+class ProcessTimeout(ProcessKilled, subprocess.TimeoutExpired):
+    """An external tool ran past its wall-clock limit or stopped producing output"""
+
+    def __init__(self, cmd, timeout, tool_class, reason, output=None, stderr=None):
+        super().__init__(cmd, timeout, output, stderr)
+        self.tool_class = tool_class
+        # 'wall' or 'stall'
+        self.reason = reason
+
+    def __str__(self):
+        name = os.path.basename(self.cmd[0])
+        if self.reason == 'stall':
+            return f"{name} stalled: no output for {self.timeout:.0f}s"
+        return f"{name} exceeded its {self.timeout:.0f}s time limit"
+
+class ProcessInterrupted(ProcessKilled):
+    """An external tool was stopped, or never started, because the run was interrupted"""
+
+    def __init__(self, cmd):
+        super().__init__(cmd)
+        self.cmd = cmd
+
+    def __str__(self):
+        return f"{os.path.basename(self.cmd[0])} stopped: the run was interrupted"
+
+def configure(overrides):
+    """
+    Apply process_limits from config.json
+    Args:
+        overrides (dict): {tool class: {ToolLimits field: value}}; unknown classes start from 'probe'
+    """
+    for tool_class, values in (overrides or {}).items():
+        base = _limits.get(tool_class, DEFAULT_LIMITS['probe'])
+        _limits[tool_class] = base._replace(**values)
+
+def get_limits(tool_class):
+    return _limits.get(tool_class, DEFAULT_LIMITS['probe'])
+
+def wall_limit(limits, duration=None):
+    """Seconds a tool may run for, or None if there is no wall-clock limit"""
+    if limits.base_seconds is None:
+        return None
+    if limits.seconds_per_media_second:
+        if not duration:
+            return None
+        return limits.base_seconds + limits.seconds_per_media_second * duration
+    return limits.base_seconds
+
+def priority_prefix(limits):
+    """nice/ionice wrapper for a command; both exec the tool, so its pid and process group stay the same"""
+    prefix = []
+    if limits.nice and shutil.which('nice'):
+        prefix += ['nice', '-n', str(limits.nice)]
+    if limits.ionice_class and shutil.which('ionice'):
+        prefix += ['ionice', '-c', str(limits.ionice_class)]
+        if limits.ionice_class in (1, 2) and limits.ionice_level is not None:
+            prefix += ['-n', str(limits.ionice_level)]
+    return prefix
+
+def kill_group(process):
+    """Stop a tool and everything it started: SIGTERM to its process group, then SIGKILL"""
+    for sig, grace in ((signal.SIGTERM, KILL_GRACE_SECONDS), (signal.SIGKILL, None)):
+        try:
+            os.killpg(process.pid, sig)
+        except ProcessLookupError:
+            return
+        try:
+            process.wait(timeout=grace)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+
+def terminate_all():
+    """Kill every tool still running, e.g. when the run is interrupted"""
+    with _active_lock:
+        processes = list(_active.values())
+    for process in processes:
+        kill_group(process)
+
+def install_interrupt_handler():
+    """
+    Make Ctrl-C kill running tools before the usual KeyboardInterrupt. Tools run in
+    their own session, so the terminal's SIGINT no longer reaches them directly.
+    The interrupted event is set first, so worker threads stop instead of starting the next tool.
+    """
+    def interrupt(signum, frame):
+        interrupted.set()
+        terminate_all()
+        signal.default_int_handler(signum, frame)
+    signal.signal(signal.SIGINT, interrupt)
+
+def drain(pipe, lines, activity, on_line=None):
+    """Read a pipe to EOF, stamping activity[0] on every line"""
+    for line in pipe:
+        activity[0] = time.monotonic()
+        if on_line:
+            try:
+                on_line(line)
+            except Exception as e:
+                # Keep reading, or the tool would block on a full pipe
+                logging.error(f"Error handling tool output: {e}")
+                on_line = None
+        elif lines is not None:
+            lines.append(line)
+    pipe.close()
+
+def run_tool(cmd, tool_class='probe', duration=None, on_line=None, merge_stderr=False):
+    """
+    Run an external tool under the limits of its class
+    Args:
+        cmd (list): Command line
+        tool_class (str): 'probe', 'mux', 'qc', 'encode' or a class added in process_limits
+        duration (float): Media duration in seconds, scales the wall-clock limit
+        on_line (callable): Called with each stdout line as it arrives instead of capturing it
+        merge_stderr (bool): Send stderr into stdout (and so to on_line)
+    Returns:
+        subprocess.CompletedProcess: Text stdout/stderr; stdout is None when on_line consumed it.
+            ffmpeg's stdout carries -progress reports that keep the stall check fed, so it is ''.
+    Raises:
+        ProcessTimeout: The tool was killed for running too long or going quiet
+        ProcessInterrupted: The run was interrupted before or while the tool ran
+        OSError: The tool could not be started
+    """
+    if interrupted.is_set():
+        raise ProcessInterrupted(cmd)
+    limits = get_limits(tool_class)
+    limit = wall_limit(limits, duration)
+    stall_seconds = limits.stall_seconds
+
+    cmd = [str(part) for part in cmd]
+    progress_only = False
+    if os.path.basename(cmd[0]) == 'ffmpeg' and stall_seconds and on_line is None:
+        # Progress blocks on stdout every half second, even with -nostats and quiet filters
+        cmd = [cmd[0], '-progress', 'pipe:1'] + cmd[1:]
+        progress_only = True
+
+    process = subprocess.Popen(
+        priority_prefix(limits) + cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT if merge_stderr else subprocess.PIPE,
+        text=True,
+        errors='replace',
+        # Own process group, so a kill reaches any children the tool started
+        start_new_session=True
+    )
+    with _active_lock:
+        _active[process.pid] = process
+
+    start = time.monotonic()
+    activity = [start]
+    stdout_lines = None if (on_line or progress_only) else []
+    stderr_lines = None if merge_stderr else []
+    readers = [threading.Thread(target=drain, args=(process.stdout, stdout_lines, activity, on_line), daemon=True)]
+    if not merge_stderr:
+        readers.append(threading.Thread(target=drain, args=(process.stderr, stderr_lines, activity), daemon=True))
+    for reader in readers:
+        reader.start()
+
+    timeout = None
+    try:
+        while True:
+            try:
+                process.wait(timeout=POLL_SECONDS)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            now = time.monotonic()
+            if limit is not None and now - start > limit:
+                timeout = ('wall', limit)
+            elif stall_seconds and now - activity[0] > stall_seconds:
+                timeout = ('stall', stall_seconds)
+            if timeout:
+                kill_group(process)
+                break
+    except BaseException:
+        kill_group(process)
+        raise
+    finally:
+        with _active_lock:
+            _active.pop(process.pid, None)
+
+    for reader in readers:
+        reader.join(timeout=KILL_GRACE_SECONDS)
+    stdout = ''.join(stdout_lines) if stdout_lines is not None else ('' if progress_only else None)
+    stderr = ''.join(stderr_lines) if stderr_lines is not None else None
+
+    if timeout:
+        reason, seconds = timeout
+        error = ProcessTimeout(cmd, seconds, tool_class, reason, stdout, stderr)
+        spans.record(f"timeout.{tool_class}", time.monotonic() - start)
+        logging.error(f"Timeout ({tool_class}): {error}; killed {' '.join(cmd[:2])} ...")
+        raise error
+    if interrupted.is_set() and process.returncode != 0:
+        raise ProcessInterrupted(cmd)
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: python3 -m scripts.process <tool_class> <command> [args ...]")
+        sys.exit(1)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    completed = run_tool(sys.argv[2:], sys.argv[1], on_line=lambda line: print(line, end=''), merge_stderr=True)
+    sys.exit(completed.returncode)
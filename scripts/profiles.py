@@ -0,0 +1,204 @@
+import copy
+import json
+import logging
+import sys
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+
+# (SVT-AV1 preset, rough whole-machine encode fps at 1080p), slowest first.
+# Only the ratios between tiers matter much: observed speed rescales all of them.
+DEFAULT_TIERS = ((3, 3.0), (4, 5.0), (5, 8.0), (6, 12.0), (8, 25.0), (10, 45.0), (12, 80.0))
+REFERENCE_PIXELS = 1920 * 1080
+# Assumed for sources that could not be probed
+DEFAULT_DURATION = 45 * 60
+DEFAULT_FPS = 24.0
+# Weight given to each new speed observation
+SPEED_SMOOTHING = 0.3
+
+# One encoder speed tier: the HandBrake preset `name` inside the import file `preset_file`
+Profile = namedtuple('Profile', ['name', 'preset_file', 'video_preset', 'fps_1080p'])
+
+def load_base_preset(preset_path):
+    """Return the parsed preset file and its first preset"""
+    with open(preset_path) as f:
+        data = json.load(f)
+    return data, data['PresetList'][0]
+
+def generate_profiles(preset_path, tiers=DEFAULT_TIERS, output_dir=None):
+    """
+    Derive one preset per speed tier from a base HandBrake preset file
+    Args:
+        preset_path (str): Base preset JSON exported from HandBrake
+        tiers (iterable): (encoder preset, 1080p fps) pairs, slowest first
+        output_dir (str): Where the generated file is written (default: <preset dir>/generated)
+    Returns:
+        list: Profile per tier, slowest first; just the base preset if it has no numeric speed
+    """
+    preset_path = Path(preset_path)
+    data, base = load_base_preset(preset_path)
+    base_name = base['PresetName']
+
+    try:
+        int(base.get('VideoPreset'))
+    except (TypeError, ValueError):
+        logging.warning(f"{base_name} uses a non-numeric encoder preset, speed tiers disabled")
+        return [Profile(base_name, preset_path, base.get('VideoPreset'), None)]
+
+    tiers = sorted(((int(speed), float(fps)) for speed, fps in tiers), key=lambda tier: tier[1])
+    generated = copy.deepcopy(data)
+    generated['PresetList'] = []
+    profiles = []
+    output_dir = Path(output_dir) if output_dir else preset_path.parent / 'generated'
+    output_path = output_dir / f"{preset_path.stem}.tiers.json"
+
+    for speed, fps in tiers:
+        preset = copy.deepcopy(base)
+        preset['PresetName'] = f"{base_name} p{speed}"
+        preset['VideoPreset'] = str(speed)
+        generated['PresetList'].append(preset)
+        profiles.append(Profile(preset['PresetName'], output_path, speed, fps))
+
+    # Rewrite only when the base preset or tiers changed, so concurrent runs don't race on it
+    text = json.dumps(generated, indent=2)
+    if not output_path.exists() or output_path.read_text() != text:
+        output_dir.mkdir(parents=True, exist_ok=True)
+        temp_path = output_path.with_name(output_path.name + '.tmp')
+        temp_path.write_text(text)
+        temp_path.replace(output_path)
+        logging.info(f"Generated {len(profiles)} speed tier(s) from {preset_path} in {output_path}")
+
+    return profiles
+
+def estimate_frames(job):
+    """Frame count of a job's source from its probe results, or a typical episode if unknown"""
+    info = job.media_info
+    duration = info.duration if info and info.duration else DEFAULT_DURATION
+    fps = info.fps if info and info.fps else DEFAULT_FPS
+    return duration * fps
+
+def estimate_pixels(job):
+    info = job.media_info
+    return info.pixels if info and info.pixels else REFERENCE_PIXELS
+
+class SpeedPlanner:
+    """
+    Picks an encoder speed tier per file so the queued backlog finishes by its deadline.
+    Each job is due deadline_seconds after it was queued. When a job starts, the slowest
+    tier is chosen for which every pending job, encoded in due order at that tier, still
+    finishes in time; measured encode speed continually corrects the estimates.
+    """
+
+    def __init__(self, profiles, base, deadline_seconds=None):
+        self.profiles = profiles
+        self.base = base
+        self.deadline_seconds = deadline_seconds
+        # Observed speed relative to the tier estimates
+        self.speed_factor = 1.0
+        self._pending = {}
+        self._active = 0
+        self._lock = threading.Lock()
+
+    @property
+    def adaptive(self):
+        return bool(self.deadline_seconds) and len(self.profiles) > 1
+
+    def add(self, job):
+        """Register a queued job so its work counts against the deadline"""
+        with self._lock:
+            self._pending.setdefault(job.id, (job, time.time() + (self.deadline_seconds or 0)))
+
+    def discard(self, job):
+        """Forget a job that will not be encoded (skipped, remuxed or failed early)"""
+        with self._lock:
+            self._pending.pop(job.id, None)
+
+    def encode_seconds(self, job, profile):
+        """Estimated wall time to encode a job alone on the machine at a tier"""
+        if not profile.fps_1080p:
+            return 0.0
+        fps = profile.fps_1080p * self.speed_factor * REFERENCE_PIXELS / estimate_pixels(job)
+        return estimate_frames(job) / fps
+
+    def estimate(self, job):
+        """Estimated encode seconds for a job at the base preset, corrected by observed speed"""
+        if self.base.fps_1080p:
+            return self.encode_seconds(job, self.base)
+        # No speed figure for this preset: still proportional to frames x pixels, which is what ordering needs
+        return estimate_frames(job) * estimate_pixels(job) / REFERENCE_PIXELS / self.speed_factor
+
+    def fits(self, profile, queue, now):
+        elapsed = 0.0
+        for job, due in queue:
+            elapsed += self.encode_seconds(job, profile)
+            if now + elapsed > due:
+                return False
+        return True
+
+    def choose(self, job):
+        """
+        Pick the tier for a job that is about to start encoding
+        Returns: Profile to encode with
+        """
+        with self._lock:
+            self._pending.setdefault(job.id, (job, time.time() + (self.deadline_seconds or 0)))
+            self._active += 1
+            if not self.adaptive:
+                return self.base
+
+            queue = sorted(self._pending.values(), key=lambda entry: entry[1])
+            now = time.time()
+            chosen = next((p for p in self.profiles if self.fits(p, queue, now)), self.profiles[-1])
+            backlog_hours = sum(self.encode_seconds(j, chosen) for j, _ in queue) / 3600
+
+        logging.info(f"Encoding {job.current_path.name} with {chosen.name} "
+                     f"({len(queue)} queued, ~{backlog_hours:.1f}h of work at this tier)")
+        return chosen
+
+    def record(self, job, profile, seconds=None):
+        """
+        Mark a chosen job's encode as over, folding its speed into future estimates
+        Args:
+            job (Job): Job passed to choose()
+            profile (Profile): Tier it was encoded with
+            seconds (float): Wall time of a successful encode, or None if it failed
+        """
+        with self._lock:
+            # A job sharing the machine with others only gets its share of the cores
+            concurrency = max(1, self._active)
+            self._active = max(0, self._active - 1)
+            self._pending.pop(job.id, None)
+            if not (seconds and profile.fps_1080p and job.media_info):
+                return
+            ratio = self.encode_seconds(job, profile) * concurrency / seconds
+            self.speed_factor *= (1 - SPEED_SMOOTHING) + SPEED_SMOOTHING * ratio
+        logging.info(f"Encode speed now {self.speed_factor:.2f}x the tier estimates")
+
+def create_planner(config, preset_path):
+    """Build the speed planner described by config.json"""
+    _, base = load_base_preset(preset_path)
+    tiers = config.get('encode_tiers', DEFAULT_TIERS)
+    # The base preset's speed estimate comes from the tier with the same encoder preset, if any
+    base_fps = {str(speed): float(fps) for speed, fps in tiers}.get(str(base.get('VideoPreset')))
+    base_profile = Profile(base['PresetName'], Path(preset_path), base.get('VideoPreset'), base_fps)
+    deadline_hours = float(config.get('encode_deadline_hours', 0) or 0)
+    if not deadline_hours:
+        # Without a deadline every file is encoded with the base preset itself, as before
+        return SpeedPlanner([base_profile], base_profile)
+
+    profiles = generate_profiles(
+        preset_path,
+        tiers=tiers,
+        output_dir=config.get('generated_preset_directory')
+    )
+    return SpeedPlanner(profiles, base_profile, deadline_hours * 3600)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 -m scripts.profiles <preset_file>")
+        sys.exit(1)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    for profile in generate_profiles(sys.argv[1]):
+        print(profile)
@@ -0,0 +1,222 @@
+import subprocess
+import concurrent.futures
+import json
+import logging
+import math
+import os
+import sys
+import time
+from scripts import audio_test, process, video_test, spans
+
+class QCReport:
+    """Outcome of the quality checks run against one transcoded file"""
+
+    __slots__ = ('file_path', 'mode', 'has_video', 'duration', 'black_sections',
+                 'mean_volume', 'errors', 'elapsed')
+
+    def __init__(self, file_path, mode='full'):
+        self.file_path = str(file_path)
+        self.mode = mode
+        self.has_video = False
+        self.duration = None
+        self.black_sections = 0
+        self.mean_volume = None
+        self.errors = []
+        self.elapsed = 0.0
+
+    @property
+    def passed(self):
+        return not self.errors
+
+    def __repr__(self):
+        return (f"QCReport(file_path={self.file_path!r}, mode={self.mode!r}, passed={self.passed}, "
+                f"black_sections={self.black_sections}, mean_volume={self.mean_volume}, "
+                f"errors={self.errors})")
+
+@spans.timed()
+def probe_video_stream(file_path):
+    """
+    Check the file has a video stream and read its duration
+    Args:
+        file_path (str): Path to video file
+    Returns:
+        tuple: (has_video, duration_seconds) where duration may be None
+    """
+    cmd = [
+        'ffprobe',
+        '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'stream=codec_type:format=duration',
+        '-of', 'json',
+        str(file_path)
+    ]
+
+    result = process.run_tool(cmd, 'probe')
+    if result.returncode != 0:
+        logging.error(f"FFprobe error: {result.stderr}")
+        return False, None
+
+    data = json.loads(result.stdout or '{}')
+    has_video = any(s.get('codec_type') == 'video' for s in data.get('streams', []))
+    try:
+        duration = float(data.get('format', {}).get('duration'))
+    except (TypeError, ValueError):
+        duration = None
+    return has_video, duration
+
+@spans.timed()
+def decode_checks(file_path, seek=None, length=None, threads=None, duration=None):
+    """
+    Decode a file (or a window of it) once with blackdetect and volumedetect attached
+    Args:
+        file_path (str): Path to video file
+        seek (float): Start of the window in seconds, or None for the whole file
+        length (float): Window length in seconds
+        threads (int): Decoder threads, or None for ffmpeg's default
+        duration (float): Length of the whole file, sets the time limit of a full decode
+    Returns:
+        tuple: (black_sections, mean_volume_db) where mean volume may be None
+    """
+    cmd = ['ffmpeg', '-nostats']
+    if threads:
+        cmd.extend(['-threads', str(threads)])
+    if seek is not None:
+        # Input-side seek jumps straight to the nearest keyframe instead of decoding up to it
+        cmd.extend(['-ss', f'{seek:.3f}', '-t', f'{length:.3f}'])
+    cmd.extend([
+        '-i', str(file_path),
+        '-vf', video_test.BLACKDETECT_FILTER,
+        '-af', 'volumedetect',
+        '-sn',
+        '-dn',
+        '-f', 'null',
+        '-'
+    ])
+    result = process.run_tool(cmd, 'qc', length if seek is not None else duration)
+
+    # Both filters log to stderr
+    return (video_test.count_black_sections(result.stderr),
+            audio_test.parse_mean_volume(result.stderr))
+
+def get_sample_windows(duration, sample_count, sample_seconds):
+    """Return (start, length) for sample_count evenly spaced windows across the file"""
+    length = min(sample_seconds, duration / sample_count)
+    windows = []
+    for i in range(sample_count):
+        centre = duration * (i + 0.5) / sample_count
+        start = min(max(0.0, centre - length / 2), max(0.0, duration - length))
+        windows.append((start, length))
+    return windows
+
+def combine_volumes(volumes):
+    """Average equal-length window volumes in the power domain, as volumedetect does"""
+    mean_power = sum(10 ** (v / 10) for v in volumes) / len(volumes)
+    return 10 * math.log10(mean_power) if mean_power > 0 else -math.inf
+
+def evaluate(report, max_black_sections=video_test.MAX_BLACK_SECTIONS):
+    """
+    Apply the black-frame and silence thresholds to a filled-in report
+    Args:
+        report (QCReport): Report with black sections and mean volume filled in
+        max_black_sections (float): Black sections allowed in the part of the file that was decoded
+    """
+    if report.black_sections:
+        logging.warning(f"Black frames detected in {report.file_path}")
+    if report.black_sections > max_black_sections:
+        report.errors.append(f"too many black sections ({report.black_sections}, "
+                             f"limit {max_black_sections:.3g})")
+    if report.mean_volume is None:
+        report.errors.append("no volume information")
+    elif report.mean_volume < audio_test.SILENCE_THRESHOLD_DB:
+        report.errors.append(f"audio is silent ({report.mean_volume:.1f} dB)")
+
+def run_full_checks(report):
+    """Decode the whole file once and evaluate it"""
+    report.mode = 'full'
+    report.black_sections, report.mean_volume = decode_checks(report.file_path, duration=report.duration)
+    evaluate(report)
+
+def run_sampled_checks(report, sample_count, sample_seconds, max_workers=None):
+    """
+    Decode evenly spaced windows in parallel and evaluate the aggregated results.
+    MAX_BLACK_SECTIONS is a whole-file limit, so it is scaled by the share of the file the
+    windows cover. This assumes black sections are spread evenly through the file and
+    ignores sections cut in two by a window edge. With small windows the scaled limit is
+    below one, so any black section fails the sample and, by default, triggers a full check.
+    """
+    report.mode = 'sampled'
+    windows = get_sample_windows(report.duration, sample_count, sample_seconds)
+    max_workers = max_workers or min(len(windows), os.cpu_count() or 1)
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=max_workers,
+        thread_name_prefix='qc'
+    ) as executor:
+        # One decoder thread per window so the windows spread across cores
+        results = list(executor.map(
+            lambda window: decode_checks(report.file_path, window[0], window[1], threads=1),
+            windows
+        ))
+
+    report.black_sections = sum(black for black, _ in results)
+    volumes = [volume for _, volume in results]
+    # A window without volume information means the audio track is missing or unreadable
+    report.mean_volume = None if None in volumes else combine_volumes(volumes)
+    sampled_seconds = sum(length for _, length in windows)
+    evaluate(report, video_test.MAX_BLACK_SECTIONS * sampled_seconds / report.duration)
+
+@spans.timed()
+def run_quality_checks(file_path, mode='full', sample_count=8, sample_seconds=20,
+                       max_workers=None, full_on_sample_failure=True):
+    """
+    Run black-frame and silence detection over a file
+    Args:
+        file_path (str): Path to transcoded file
+        mode (str): 'full' decodes the whole file once, 'sampled' decodes short windows only
+        sample_count (int): Number of windows to decode in sampled mode
+        sample_seconds (float): Length of each window in seconds
+        max_workers (int): Concurrent window decodes, defaults to one per core
+        full_on_sample_failure (bool): Re-check with a full decode when sampling fails
+    Returns:
+        QCReport: Structured result; report.passed is False if any check failed
+    Raises:
+        ProcessTimeout: A decode or probe was killed by its time limit or stall watchdog
+    """
+    report = QCReport(file_path, mode)
+    start = time.monotonic()
+
+    try:
+        report.has_video, report.duration = probe_video_stream(file_path)
+        if not report.has_video:
+            report.errors.append("no video stream")
+            return report
+
+        # Sampling only pays off when the windows cover less than the whole file
+        if (mode == 'sampled' and report.duration
+                and report.duration > sample_count * sample_seconds):
+            run_sampled_checks(report, sample_count, sample_seconds, max_workers)
+            if not report.passed and full_on_sample_failure:
+                logging.warning(f"Sampled QC failed for {file_path} ({', '.join(report.errors)}),"
+                                f" confirming with a full decode")
+                report.errors = []
+                run_full_checks(report)
+        else:
+            run_full_checks(report)
+
+    except process.ProcessKilled:
+        raise
+    except (subprocess.SubprocessError, OSError, ValueError) as e:
+        report.errors.append(f"error running quality checks: {e}")
+    finally:
+        report.elapsed = time.monotonic() - start
+
+    return report
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 -m scripts.qc <video_file_path> [full|sampled]")
+        sys.exit(1)
+
+    qc_report = run_quality_checks(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else 'full')
+    print(qc_report)
+    sys.exit(0 if qc_report.passed else 1)
@@ -1,9 +1,14 @@
 import os
 import sys
-import subprocess
 import re
 import logging
 from pathlib import Path
+try:
+    from scripts import media_path, spans, title
+except ImportError:  # Run directly as python3 scripts/rename.py
+    import media_path
+    import spans
+    import title
 
 def extract_tv_info(file_path):
     """
@@ -13,69 +18,16 @@ def extract_tv_info(file_path):
     Returns:
         tuple: (show_name, season_num, episode_num) or (None, None, None)
     """
-    path = Path(file_path)
-    full_path = str(path)
-    
-    # Try to get show name from parent directories first
-    show_name = None
-    for parent in path.parents:
-        if any(str(season_dir.name).lower().startswith('season') for season_dir in parent.glob('Season *')):
-            show_name = parent.name
-            break
-    
-    if not show_name:
-        # Try to extract from filename
-        filename_match = re.match(r'(.+?)(?:\s+[Ss]eason|\s+[Ss]\d)', path.stem, re.IGNORECASE)
-        if filename_match:
-            show_name = filename_match.group(1)
-    
-    # Clean up show name
-    if show_name:
-        show_name = re.sub(r'[._]', ' ', show_name).strip()
-    
-    # Find season number
-    season_patterns = [
-        r'Season\s*(\d{1,2})',           # Matches "Season 4" in directory
-        r'[Ss](\d{1,2})[Ee]\d{1,2}',     # Matches "S4E1"
-        r'season\s*(\d{1,2})\s*episode',  # Matches "season 1 episode"
-    ]
-    
-    season_num = None
-    # First check directory name
-    for parent in path.parents:
-        for pattern in season_patterns:
-            match = re.search(pattern, str(parent.name), re.IGNORECASE)
-            if match:
-                season_num = match.group(1).zfill(2)
-                break
-        if season_num:
-            break
-    
-    # If not found in directory, check filename
-    if not season_num:
-        for pattern in season_patterns:
-            match = re.search(pattern, path.name, re.IGNORECASE)
-            if match:
-                season_num = match.group(1).zfill(2)
-                break
-    
-    # Find episode number
-    episode_patterns = [
-        r'[Ee](\d{1,2})',                # Matches "E1"
-        r'[Ss]\d{1,2}[Ee](\d{1,2})',     # Matches "S4E1"
-        r'episode\s*(\d{1,2})',          # Matches "episode 1"
-    ]
-    
-    episode_num = None
-    for pattern in episode_patterns:
-        match = re.search(pattern, path.name, re.IGNORECASE)
-        if match:
-            episode_num = match.group(1).zfill(2)
-            break
-    
+    tv_info = media_path.extract_tv_info(file_path)
+
+    if tv_info:
+        show_name, season_num, episode_num = tv_info.show, f"{tv_info.season:02d}", f"{tv_info.episode:02d}"
+    else:
+        show_name = season_num = episode_num = None
+
     logging.info(f"Extracted TV info - Show: {show_name}, Season: {season_num}, Episode: {episode_num}")
-    
-    if show_name and season_num and episode_num:
+
+    if tv_info:
         return show_name, season_num, episode_num
     return None, None, None
 
@@ -86,6 +38,32 @@ def create_tv_structure(base_path, show_title, season_num):
     os.makedirs(season_path, exist_ok=True)
     return season_path
 
+def get_search_query(file_path):
+    """
+    Work out what to look up on OMDb for a media file
+    Returns: (search_name, is_tv)
+    """
+    show_name, season_num, episode_num = extract_tv_info(file_path)
+    if show_name and season_num and episode_num:
+        return show_name, True
+    return os.path.splitext(os.path.basename(file_path))[0], False
+
+@spans.timed()
+def rename_media_files(file_paths, **resolve_options):
+    """
+    Rename a batch of media files, resolving all their titles up front in one
+    deduplicated, concurrent pass so each rename is served from the title cache
+    Args:
+        file_paths (list): Paths to rename
+        **resolve_options: Passed through to title.resolve_titles
+    Returns:
+        dict: {file_path: new_path or None}
+    """
+    file_paths = [path for path in file_paths if os.path.exists(path)]
+    title.resolve_titles([get_search_query(path) for path in file_paths], **resolve_options)
+    return {path: rename_media_file(path) for path in file_paths}
+
+@spans.timed()
 def rename_media_file(file_path):
     """Renames a media file using the proper title format"""
     if not os.path.exists(file_path):
@@ -109,14 +87,9 @@ def rename_media_file(file_path):
             search_name = os.path.splitext(filename)[0]
             logging.info(f"Searching for movie: {search_name}")
         
-        result = subprocess.run(
-            ['python3', 'scripts/title.py', search_name, '--tv' if is_tv else '--movie'],
-            capture_output=True,
-            text=True
-        )
-        proper_title = result.stdout.strip()
+        proper_title = title.get_proper_title(search_name, is_tv)
         
-        if proper_title and "not found" not in proper_title.lower():
+        if proper_title:
             if is_tv:
                 # Extract base title and year
                 base_title = proper_title.split('(')[0].strip()
@@ -147,14 +120,16 @@ def rename_media_file(file_path):
             logging.error(f"Could not get proper title for: {search_name}")
             return None
             
-    except subprocess.SubprocessError as e:
-        logging.error(f"Error running title.py: {e}")
+    except OSError as e:
+        logging.error(f"Error renaming {file_path}: {e}")
         return None
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Usage: python3 rename.py <movie_file_path>")
+        print("Usage: python3 rename.py <movie_file_path> [<movie_file_path> ...]")
         sys.exit(1)
         
-    file_path = sys.argv[1]
-    rename_media_file(file_path)
+    if len(sys.argv) > 2:
+        rename_media_files(sys.argv[1:])
+    else:
+        rename_media_file(sys.argv[1])
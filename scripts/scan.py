@@ -0,0 +1,187 @@
+import os
+import sqlite3
+import logging
+import sys
+import time
+from collections import namedtuple
+
+MEDIA_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov')
+
+# Coarsest directory mtime granularity expected (FAT and some SMB/NAS mounts use 2s).
+# A listing taken this close to the directory's mtime may have missed an entry added
+# in the same tick, so it is not reused, like git's racily clean index entries.
+RACY_NS = 2 * 10**9
+
+ScanEntry = namedtuple('ScanEntry', ['path', 'size', 'mtime_ns'])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    listed_ns INTEGER
+);
+CREATE TABLE IF NOT EXISTS entries (
+    dir TEXT NOT NULL,
+    name TEXT NOT NULL,
+    is_dir INTEGER NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    PRIMARY KEY (dir, name)
+);
+"""
+
+def is_media_file(name):
+    """Return True if a filename has one of the media extensions we process"""
+    return os.path.splitext(name)[1].lower() in MEDIA_EXTENSIONS
+
+class ScanIndex:
+    """
+    Persistent listing of the source tree keyed by directory mtime.
+    A directory whose mtime has not changed since the last scan is served
+    from the index instead of being listed again.
+    """
+
+    def __init__(self, db_path='.scan_index.db'):
+        self.db_path = str(db_path)
+        self._conn = sqlite3.connect(self.db_path)
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(dirs)")}
+        if 'listed_ns' not in columns:
+            # Listings from older indexes have no time, so each directory is listed once more
+            self._conn.execute("ALTER TABLE dirs ADD COLUMN listed_ns INTEGER")
+            self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def cached_mtime(self, dir_path):
+        """Return (mtime_ns, listed_ns) recorded for a directory, or (None, None)"""
+        row = self._conn.execute(
+            "SELECT mtime_ns, listed_ns FROM dirs WHERE path = ?", (dir_path,)
+        ).fetchone()
+        return tuple(row) if row else (None, None)
+
+    def is_fresh(self, dir_path, mtime_ns):
+        """True if the recorded listing matches mtime_ns and was taken clearly after it"""
+        cached_mtime_ns, listed_ns = self.cached_mtime(dir_path)
+        return (cached_mtime_ns == mtime_ns and listed_ns is not None
+                and listed_ns - mtime_ns >= RACY_NS)
+
+    def cached_entries(self, dir_path):
+        """Return (subdir_names, [(name, size, mtime_ns)]) recorded for a directory"""
+        subdirs, files = [], []
+        for name, is_dir, size, mtime_ns in self._conn.execute(
+            "SELECT name, is_dir, size, mtime_ns FROM entries WHERE dir = ?", (dir_path,)
+        ):
+            if is_dir:
+                subdirs.append(name)
+            else:
+                files.append((name, size, mtime_ns))
+        return subdirs, files
+
+    def store_entries(self, dir_path, mtime_ns, subdirs, files, listed_ns=None):
+        """
+        Replace the recorded listing of a directory, forgetting subtrees that vanished
+        Args:
+            listed_ns (int): time.time_ns() taken just before the directory was listed
+        """
+        old_subdirs, _ = self.cached_entries(dir_path)
+        for name in set(old_subdirs) - set(subdirs):
+            removed = os.path.join(dir_path, name)
+            self._conn.execute(
+                "DELETE FROM dirs WHERE path = ? OR path LIKE ?", (removed, removed + os.sep + '%')
+            )
+            self._conn.execute(
+                "DELETE FROM entries WHERE dir = ? OR dir LIKE ?", (removed, removed + os.sep + '%')
+            )
+
+        self._conn.execute("DELETE FROM entries WHERE dir = ?", (dir_path,))
+        self._conn.executemany(
+            "INSERT INTO entries (dir, name, is_dir, size, mtime_ns) VALUES (?, ?, 1, NULL, NULL)",
+            [(dir_path, name) for name in subdirs]
+        )
+        self._conn.executemany(
+            "INSERT INTO entries (dir, name, is_dir, size, mtime_ns) VALUES (?, ?, 0, ?, ?)",
+            [(dir_path, name, size, mtime_ns) for name, size, mtime_ns in files]
+        )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO dirs (path, mtime_ns, listed_ns) VALUES (?, ?, ?)",
+            (dir_path, mtime_ns, listed_ns)
+        )
+
+    def commit(self):
+        self._conn.commit()
+
+def list_directory(dir_path):
+    """List a directory with os.scandir, keeping only subdirectories and media files"""
+    subdirs, files = [], []
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.name)
+                elif entry.is_file() and is_media_file(entry.name):
+                    stat = entry.stat()
+                    files.append((entry.name, stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                # Entry vanished mid-scan (e.g. a download was moved away)
+                continue
+    return subdirs, files
+
+def iter_media_files(source_dir, index=None, full_rescan=False):
+    """
+    Walk a source tree lazily, yielding one ScanEntry per media file
+    Args:
+        source_dir (str): Root of the tree to scan
+        index (ScanIndex): Persistent index used to skip unchanged directories
+        full_rescan (bool): List every directory even if the index says it is unchanged
+    Yields:
+        ScanEntry: (path, size, mtime_ns) for each media file
+    """
+    stack = [str(source_dir)]
+    listed = reused = 0
+
+    while stack:
+        dir_path = stack.pop()
+        try:
+            mtime_ns = os.stat(dir_path).st_mtime_ns
+        except OSError:
+            continue
+
+        # Adding, removing or renaming an entry bumps the directory mtime, so an unchanged
+        # mtime means the cached listing is still accurate, unless it was taken in the same tick
+        if index and not full_rescan and index.is_fresh(dir_path, mtime_ns):
+            subdirs, files = index.cached_entries(dir_path)
+            reused += 1
+        else:
+            listed_ns = time.time_ns()
+            try:
+                subdirs, files = list_directory(dir_path)
+            except OSError as e:
+                logging.error(f"Error scanning {dir_path}: {e}")
+                continue
+            if index:
+                index.store_entries(dir_path, mtime_ns, subdirs, files, listed_ns)
+            listed += 1
+
+        stack.extend(os.path.join(dir_path, name) for name in sorted(subdirs, reverse=True))
+        for name, size, file_mtime_ns in sorted(files):
+            yield ScanEntry(os.path.join(dir_path, name), size, file_mtime_ns)
+
+    if index:
+        index.commit()
+    logging.info(f"Scanned {source_dir}: listed {listed} changed director(ies), "
+                 f"reused {reused} from the scan index")
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 -m scripts.scan <source_directory> [--full-rescan]")
+        sys.exit(1)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    scan_index = ScanIndex()
+    try:
+        for scan_entry in iter_media_files(sys.argv[1], scan_index, '--full-rescan' in sys.argv):
+            print(scan_entry.path)
+    finally:
+        scan_index.close()
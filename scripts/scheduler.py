@@ -0,0 +1,93 @@
+import time
+import logging
+import threading
+
+POLICIES = ('fifo', 'sjf', 'priority', 'fair')
+
+def job_priority(job, priorities):
+    """
+    Highest priority configured for any show name or path component of a job
+    Args:
+        job (Job): Job to rank
+        priorities (dict): {show name or directory name: priority}, higher runs first
+    Returns:
+        int: Priority, 0 if nothing matches
+    """
+    if not priorities:
+        return 0
+    names = set(job.current_path.parts) | set(job.source_path.parts)
+    if job.tv_info:
+        names.add(job.tv_info[0])
+    return max((priorities[name] for name in names if name in priorities), default=0)
+
+class Scheduler:
+    """
+    Ordered queue of jobs waiting for a transcode slot. Workers call pop() when they
+    are free, so the choice is made with the latest estimates and waiting times.
+
+    fifo      discovery order
+    sjf       shortest estimated encode first
+    priority  configured show/directory priority first, then discovery order
+    fair      shortest first, but every second a job waits counts against its
+              estimate (times aging_factor), so long titles are never starved
+    """
+
+    def __init__(self, policy='fifo', estimate=None, priorities=None, aging_factor=1.0):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown schedule policy: {policy} (expected one of {', '.join(POLICIES)})")
+        self.policy = policy
+        self.estimate = estimate or (lambda job: 0.0)
+        self.priorities = priorities or {}
+        self.aging_factor = aging_factor
+        self._queued = {}
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._queued)
+
+    def add(self, job):
+        with self._lock:
+            self._sequence += 1
+            self._queued[job.id] = (job, self._sequence, time.monotonic())
+
+    def _rank(self, entry, now):
+        job, sequence, queued_at = entry
+        if self.policy == 'sjf':
+            return (self.estimate(job), sequence)
+        if self.policy == 'priority':
+            return (-job_priority(job, self.priorities), sequence)
+        if self.policy == 'fair':
+            return (self.estimate(job) - (now - queued_at) * self.aging_factor, sequence)
+        return (sequence,)
+
+    def pop(self):
+        """Remove and return the job that should run next, or None if the queue is empty"""
+        with self._lock:
+            if not self._queued:
+                return None
+            now = time.monotonic()
+            job, _, _ = min(self._queued.values(), key=lambda entry: self._rank(entry, now))
+            del self._queued[job.id]
+
+        if self.policy != 'fifo':
+            logging.info(f"Scheduling {job.current_path.name} next ({self.policy}, "
+                         f"~{self.estimate(job) / 60:.0f} min estimated)")
+        return job
+
+    def drain(self):
+        """Pop every job in scheduling order, for queues that are ordered once up front"""
+        jobs = []
+        while (job := self.pop()) is not None:
+            jobs.append(job)
+        return jobs
+
+def create_scheduler(config, planner=None):
+    """Build the scheduler described by config.json, estimating encode time with planner"""
+    return Scheduler(
+        policy=config.get('schedule_policy', 'fifo'),
+        estimate=planner.estimate if planner else None,
+        priorities=config.get('schedule_priorities', {}),
+        aging_factor=float(config.get('schedule_aging_factor', 1.0))
+    )
@@ -0,0 +1,171 @@
+import sys
+import time
+import logging
+import functools
+import threading
+from collections import Counter
+
+class SpanStats:
+    """Running totals for one span name"""
+
+    __slots__ = ('count', 'total', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+_spans = {}
+_lock = threading.Lock()
+
+class span:
+    """
+    Time a block and add it to the run's totals under name
+        with spans.span('scan'):
+            ...
+    """
+
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+def record(name, seconds):
+    with _lock:
+        stats = _spans.get(name)
+        if stats is None:
+            stats = _spans[name] = SpanStats()
+        stats.add(seconds)
+
+def timed(name=None):
+    """Decorator form of span; the name defaults to module.function (just function in main.py)"""
+    def decorator(func):
+        module = func.__module__.rsplit('.', 1)[-1]
+        span_name = name or (func.__name__ if module == '__main__' else f"{module}.{func.__name__}")
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(span_name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+def snapshot():
+    """{name: (count, total_seconds, max_seconds)} for every span recorded so far"""
+    with _lock:
+        return {name: (stats.count, stats.total, stats.max) for name, stats in _spans.items()}
+
+def reset():
+    with _lock:
+        _spans.clear()
+
+def summary_table(wall_seconds=None):
+    """
+    Format the recorded spans, slowest total first
+    Spans nest and run on several threads at once, so totals can add up to more than the wall time.
+    """
+    rows = sorted(snapshot().items(), key=lambda item: item[1][1], reverse=True)
+    if not rows:
+        return "No timing spans recorded"
+
+    width = max(len('span'), *(len(name) for name, _ in rows))
+    lines = [f"{'span':<{width}}  {'calls':>7}  {'total s':>10}  {'mean s':>9}  {'max s':>9}"
+             + ("  % wall" if wall_seconds else "")]
+    for name, (count, total, longest) in rows:
+        line = f"{name:<{width}}  {count:>7}  {total:>10.2f}  {total / count:>9.3f}  {longest:>9.3f}"
+        if wall_seconds:
+            line += f"  {total / wall_seconds:>6.1%}"
+        lines.append(line)
+    return '\n'.join(lines)
+
+def log_summary(wall_seconds=None):
+    """Log the timing summary table for this run"""
+    header = "=== Timing Summary ===" + (f" (wall {wall_seconds:.1f}s)" if wall_seconds else "")
+    logging.info(f"\n{header}\n{summary_table(wall_seconds)}")
+
+class SamplingProfiler:
+    """
+    Statistical profiler for every Python thread: a background thread records each
+    thread's stack every interval seconds. Unlike cProfile it sees the worker pools,
+    and its overhead stays flat however many functions run.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in list(sys._current_frames().items()):
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def write_folded(self, path):
+        """Write collapsed stacks, readable by flamegraph.pl and speedscope"""
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def top_functions(self, limit=25):
+        """
+        Functions by samples where they were running (self) and anywhere on the stack (total)
+        Returns: list of (function, self_samples, total_samples), highest total first
+        """
+        own, total = Counter(), Counter()
+        for stack, count in self.samples.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for function in set(frames):
+                total[function] += count
+        return [(function, own[function], samples) for function, samples in total.most_common(limit)]
+
+    def summary(self, limit=25):
+        sample_count = sum(self.samples.values())
+        if not sample_count:
+            return "No profile samples collected"
+        lines = [f"{'self %':>7}  {'total %':>7}  function ({sample_count} samples every {self.interval * 1000:g} ms)"]
+        for function, own, total in self.top_functions(limit):
+            lines.append(f"{own / sample_count:>7.1%}  {total / sample_count:>7.1%}  {function}")
+        return '\n'.join(lines)
@@ -0,0 +1,229 @@
+import sys
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+
+STORE_PATH = '.telemetry.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS job_metrics (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id INTEGER,
+    source_path TEXT NOT NULL,
+    finished_at REAL NOT NULL,
+    decision TEXT,
+    preset TEXT,
+    video_codec TEXT,
+    width INTEGER,
+    height INTEGER,
+    duration REAL,
+    input_bytes INTEGER,
+    output_bytes INTEGER,
+    encode_fps REAL,
+    realtime_factor REAL,
+    rename_seconds REAL,
+    analyze_seconds REAL,
+    transcode_seconds REAL,
+    test_seconds REAL,
+    move_seconds REAL
+);
+CREATE INDEX IF NOT EXISTS job_metrics_finished_at ON job_metrics (finished_at);
+"""
+
+STAGE_COLUMNS = ('rename', 'analyze', 'transcode', 'test', 'move')
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+def resolution_class(height):
+    """Bucket a frame height into the usual names ('2160p', '1080p', ...)"""
+    if not height:
+        return 'unknown'
+    for name, minimum in (('2160p', 1600), ('1440p', 1300), ('1080p', 900), ('720p', 600), ('576p', 500)):
+        if height >= minimum:
+            return name
+    return 'sd'
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+class TelemetryStore:
+    """SQLite record of every finished job's sizes, speeds and per-stage timings"""
+
+    def __init__(self, db_path=STORE_PATH, read_only=False):
+        self.db_path = str(db_path)
+        self._lock = threading.Lock()
+        if read_only:
+            # Reports must not create the store or change its schema
+            self._conn = sqlite3.connect(f"{Path(self.db_path).resolve().as_uri()}?mode=ro", uri=True,
+                                         check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            return
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def record(self, job, output_bytes=None):
+        """
+        Store the metrics of a job that reached the library
+        Args:
+            job (Job): Finished job; media_info and encode_stats are used when present
+            output_bytes (int): Size of the file that was moved into the library
+        """
+        info = job.media_info
+        stats = job.encode_stats or {}
+        row = {
+            'job_id': job.id,
+            'source_path': str(job.source_path),
+            'finished_at': time.time(),
+            'decision': job.decision,
+            'preset': stats.get('preset'),
+            'video_codec': info.video_codec if info else None,
+            'width': info.width if info else None,
+            'height': info.height if info else None,
+            'duration': (info.duration if info else None) or stats.get('duration'),
+            'input_bytes': stats.get('input_bytes') or (info.size if info else None),
+            'output_bytes': output_bytes or stats.get('output_bytes'),
+            'encode_fps': stats.get('encode_fps'),
+            'realtime_factor': stats.get('realtime_factor'),
+        }
+        for stage in STAGE_COLUMNS:
+            row[f'{stage}_seconds'] = job.timings.get(stage)
+
+        columns = ', '.join(row)
+        placeholders = ', '.join('?' for _ in row)
+        with self._lock, self._conn:
+            self._conn.execute(f"INSERT INTO job_metrics ({columns}) VALUES ({placeholders})",
+                               tuple(row.values()))
+
+    def rows(self, since=None):
+        """Every recorded job, optionally only those finished after since (epoch seconds)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT * FROM job_metrics WHERE finished_at >= ? ORDER BY finished_at",
+                (since or 0,)
+            ).fetchall()
+
+def get_default_store(db_path=STORE_PATH):
+    """Open the shared telemetry store on first use"""
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = TelemetryStore(db_path)
+        return _default_store
+
+def summarize(rows):
+    """
+    Aggregate telemetry rows into a report
+    Returns: dict of totals, percentiles and per-resolution / per-codec breakdowns
+    """
+    def distribution(values):
+        values = [value for value in values if value is not None]
+        if not values:
+            return None
+        return {
+            'count': len(values),
+            'mean': sum(values) / len(values),
+            'p50': percentile(values, 0.50),
+            'p90': percentile(values, 0.90),
+            'p99': percentile(values, 0.99),
+        }
+
+    def group(key):
+        groups = {}
+        for row in rows:
+            groups.setdefault(key(row), []).append(row)
+        return {
+            name: {
+                'jobs': len(members),
+                'encode_fps': distribution(row['encode_fps'] for row in members),
+                'saved_bytes': sum((row['input_bytes'] or 0) - (row['output_bytes'] or 0) for row in members),
+            }
+            for name, members in sorted(groups.items())
+        }
+
+    input_bytes = sum(row['input_bytes'] or 0 for row in rows)
+    output_bytes = sum(row['output_bytes'] or 0 for row in rows)
+    encoded = [row for row in rows if row['decision'] in (None, 'transcode') and row['transcode_seconds']]
+    content_seconds = sum(row['duration'] or 0 for row in encoded)
+    encode_seconds = sum(row['transcode_seconds'] for row in encoded)
+
+    return {
+        'jobs': len(rows),
+        'decisions': {decision: sum(1 for row in rows if (row['decision'] or 'transcode') == decision)
+                      for decision in sorted({row['decision'] or 'transcode' for row in rows})},
+        'input_bytes': input_bytes,
+        'output_bytes': output_bytes,
+        'saved_bytes': input_bytes - output_bytes,
+        'saved_fraction': (input_bytes - output_bytes) / input_bytes if input_bytes else None,
+        'content_hours_encoded': content_seconds / 3600,
+        'encode_hours': encode_seconds / 3600,
+        'realtime_factor': content_seconds / encode_seconds if encode_seconds else None,
+        'encode_fps': distribution(row['encode_fps'] for row in rows),
+        'stage_seconds': {stage: distribution(row[f'{stage}_seconds'] for row in rows) for stage in STAGE_COLUMNS},
+        'by_resolution': group(lambda row: resolution_class(row['height'])),
+        'by_codec': group(lambda row: row['video_codec'] or 'unknown'),
+    }
+
+def format_bytes(size):
+    for unit in ('B', 'KiB', 'MiB', 'GiB', 'TiB'):
+        if abs(size) < 1024 or unit == 'TiB':
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+def format_distribution(dist, unit=''):
+    if not dist:
+        return "n/a"
+    return (f"mean {dist['mean']:.1f}{unit}, p50 {dist['p50']:.1f}{unit}, "
+            f"p90 {dist['p90']:.1f}{unit}, p99 {dist['p99']:.1f}{unit} (n={dist['count']})")
+
+def print_report(report, days=None):
+    """Print a summary produced by summarize()"""
+    window = f"last {days:g} day(s)" if days else "all time"
+    print(f"=== Encode statistics ({window}) ===")
+    print(f"Jobs finished:       {report['jobs']} "
+          f"({', '.join(f'{count} {name}' for name, count in report['decisions'].items()) or 'none'})")
+    if not report['jobs']:
+        return
+
+    saved = report['saved_fraction']
+    print(f"Input / output:      {format_bytes(report['input_bytes'])} -> {format_bytes(report['output_bytes'])}")
+    print(f"Disk saved:          {format_bytes(report['saved_bytes'])}"
+          + (f" ({saved:.1%})" if saved is not None else ""))
+    print(f"Content encoded:     {report['content_hours_encoded']:.1f} h in {report['encode_hours']:.1f} h of encoding"
+          + (f" ({report['realtime_factor']:.2f}x realtime)" if report['realtime_factor'] else ""))
+    print(f"Encode fps:          {format_distribution(report['encode_fps'])}")
+    print("Stage time per job:")
+    for stage, dist in report['stage_seconds'].items():
+        print(f"  {stage:<10} {format_distribution(dist, 's')}")
+    for title, groups in (("By resolution:", report['by_resolution']), ("By source codec:", report['by_codec'])):
+        print(title)
+        for name, stats in groups.items():
+            print(f"  {name:<10} {stats['jobs']:>5} job(s), saved {format_bytes(stats['saved_bytes'])}, "
+                  f"encode fps {format_distribution(stats['encode_fps'])}")
+
+def show_stats(db_path=STORE_PATH, days=None):
+    """Print statistics for jobs finished in the last days (all jobs if None)"""
+    if not Path(db_path).exists():
+        print(f"No telemetry recorded ({db_path} does not exist)")
+        return
+    store = TelemetryStore(db_path, read_only=True)
+    try:
+        rows = store.rows(time.time() - days * 86400 if days else None)
+    finally:
+        store.close()
+    print_report(summarize(rows), days)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    show_stats(days=float(sys.argv[1]) if len(sys.argv) > 1 else None)
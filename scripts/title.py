@@ -1,83 +1,392 @@
 import warnings
 warnings.filterwarnings("ignore", category=Warning)
 import requests
+import requests.adapters
 import os
 from dotenv import load_dotenv
 import sys
 import re
+import time
+import sqlite3
+import argparse
+import threading
+import concurrent.futures
 import logging
+try:
+    from scripts import spans
+except ImportError:  # Run directly as python3 scripts/title.py
+    import spans
 
-def get_proper_title(colloquial_title, is_tv=False):
+CACHE_PATH = '.title_cache.db'
+# Found titles rarely change; misses are retried sooner in case OMDb gains the entry
+CACHE_TTL_SECONDS = 30 * 24 * 3600
+MISS_TTL_SECONDS = 24 * 3600
+
+OMDB_API_URL = 'http://www.omdbapi.com/'
+DEFAULT_WORKERS = 8
+DEFAULT_RATE_LIMIT = 10
+DEFAULT_TIMEOUT = 10
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+
+_env_loaded = False
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+class TitleCache:
+    """On-disk cache of OMDb lookups keyed on the normalized search title and type"""
+
+    def __init__(self, db_path=CACHE_PATH, ttl=CACHE_TTL_SECONDS, miss_ttl=MISS_TTL_SECONDS):
+        self.db_path = str(db_path)
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS titles ("
+            "search_title TEXT NOT NULL, "
+            "media_type TEXT NOT NULL, "
+            "proper_title TEXT, "
+            "fetched_at REAL NOT NULL, "
+            "PRIMARY KEY (search_title, media_type))"
+        )
+        self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def get(self, search_title, media_type):
+        """
+        Look up a cached result
+        Returns: (hit, proper_title) where proper_title is None for a cached miss
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT proper_title, fetched_at FROM titles WHERE search_title = ? AND media_type = ?",
+                (search_title, media_type)
+            ).fetchone()
+        if not row:
+            return False, None
+
+        proper_title, fetched_at = row
+        ttl = self.ttl if proper_title else self.miss_ttl
+        if time.time() - fetched_at > ttl:
+            return False, None
+        return True, proper_title
+
+    def put(self, search_title, media_type, proper_title):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO titles (search_title, media_type, proper_title, fetched_at) "
+                "VALUES (?, ?, ?, ?)",
+                (search_title, media_type, proper_title, time.time())
+            )
+
+    def entries(self):
+        """Return every cached row as (search_title, media_type, proper_title, fetched_at)"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT search_title, media_type, proper_title, fetched_at FROM titles "
+                "ORDER BY search_title"
+            ).fetchall()
+
+    def clear(self, search_title=None, media_type=None):
+        """Remove one title (optionally for one type only) or the whole cache"""
+        query, params = "DELETE FROM titles", []
+        if search_title is not None:
+            query += " WHERE search_title = ?"
+            params.append(search_title)
+            if media_type is not None:
+                query += " AND media_type = ?"
+                params.append(media_type)
+        with self._lock, self._conn:
+            return self._conn.execute(query, params).rowcount
+
+def get_default_cache():
+    """Open the shared title cache on first use"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = TitleCache()
+        return _default_cache
+
+def load_environment():
+    """Load .env only once per process"""
+    global _env_loaded
+    if not _env_loaded:
+        load_dotenv()
+        _env_loaded = True
+
+def get_api_key():
+    """Read the OMDb API key from the environment"""
+    load_environment()
+    return os.getenv('OMDB_API_KEY')
+
+def normalize_search_title(colloquial_title, is_tv=False):
     """
-    Convert a colloquial title to proper format with year using OMDb API
+    Clean a colloquial title into the string we search OMDb for
     Args:
         colloquial_title (str): Informal title
         is_tv (bool): Whether this is a TV show
     Returns:
-        str: Formatted title with year or None if not found
+        str: Search title
     """
-    load_dotenv()
-    api_key = os.getenv('OMDB_API_KEY')
-    
-    if not api_key:
-        logging.error("OMDB_API_KEY not found in environment variables")
-        return None
-    
     # Clean up the title
     clean_title = re.sub(r'[._]', ' ', colloquial_title)
     clean_title = re.sub(r'\s+', ' ', clean_title).strip()
-    
+
     # Remove season/episode information for TV shows
     if is_tv:
         clean_title = re.sub(r'[Ss](?:eason)?\s*\d+.*', '', clean_title)
         clean_title = re.sub(r'[Ee](?:pisode)?\s*\d+.*', '', clean_title)
         clean_title = re.sub(r'\d+x\d+.*', '', clean_title)
-    
+
     # Special handling for numeric titles
     if clean_title.isdigit():
-        search_title = clean_title
-    else:
-        # Extract year if present
-        year_match = re.search(r'\b(19|20)\d{2}\b', clean_title)
-        if year_match:
-            year = year_match.group(0)
-            clean_title = clean_title[:year_match.start()].strip()
-        search_title = clean_title
+        return clean_title
+
+    # Extract year if present
+    year_match = re.search(r'\b(19|20)\d{2}\b', clean_title)
+    if year_match:
+        clean_title = clean_title[:year_match.start()].strip()
+    return clean_title
+
+def cache_key(search_title):
+    """Cache lookups case- and whitespace-insensitively"""
+    return re.sub(r'\s+', ' ', search_title).strip().lower()
+
+class RateLimiter:
+    """Spaces out requests so no more than `rate` start per second across all threads"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def create_session(pool_size=DEFAULT_WORKERS):
+    """Create an HTTP session whose connection pool is shared by every lookup thread"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def get_api_url():
+    """OMDb endpoint; OMDB_API_URL points lookups at a local stub server for testing"""
+    load_environment()
+    return os.getenv('OMDB_API_URL', OMDB_API_URL)
+
+@spans.timed()
+def query_omdb(search_title, media_type, api_key, session=None, timeout=DEFAULT_TIMEOUT,
+               retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, rate_limiter=None):
+    """
+    Look up one title on OMDb, retrying transient failures with exponential backoff
+    Args:
+        search_title (str): Normalized search title
+        media_type (str): 'movie' or 'series'
+        api_key (str): OMDb API key
+        session (requests.Session): Pooled session, or None for a one-off request
+        timeout (float): Per-request timeout in seconds
+        retries (int): Extra attempts after a timeout, connection error or 429/5xx
+        backoff (float): Delay before the first retry, doubled on each further retry
+        rate_limiter (RateLimiter): Shared limiter applied to every attempt
+    Returns:
+        tuple: (proper_title, cacheable) where cacheable is True for definitive answers
+    """
+    http = session or requests
+    params = {'t': search_title, 'type': media_type, 'apikey': api_key}
+
+    for attempt in range(retries + 1):
+        if rate_limiter:
+            rate_limiter.wait()
+        try:
+            response = http.get(get_api_url(), params=params, timeout=timeout)
+            if response.status_code == 429 or response.status_code >= 500:
+                raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+            response.raise_for_status()
+            data = response.json()
+            break
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+            status = e.response.status_code if e.response is not None else None
+            transient = status is None or status == 429 or status >= 500
+            if not transient or attempt == retries:
+                logging.error(f"Error fetching data from OMDb: {e}")
+                return None, False
+            delay = backoff * (2 ** attempt)
+            logging.warning(f"OMDb request for {search_title} failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+        except (requests.RequestException, ValueError) as e:
+            logging.error(f"Error fetching data from OMDb: {e}")
+            return None, False
+
+    logging.info(f"OMDB response: {data}")
+
+    if data.get('Response') == 'True':
+        title = data.get('Title')
+        year = data.get('Year', '').split('–')[0]  # Get first year for TV series
+        return f"{title} ({year})", True
+
+    logging.error(f"Title not found in OMDB: {search_title}")
+    logging.error(f"OMDB error message: {data.get('Error')}")
+    # Only definitive answers are cached; key and quota errors are retried next time
+    return None, 'not found' in data.get('Error', '').lower()
+
+@spans.timed()
+def get_proper_title(colloquial_title, is_tv=False, use_cache=True, cache=None, session=None):
+    """
+    Convert a colloquial title to proper format with year using OMDb API
+    Args:
+        colloquial_title (str): Informal title
+        is_tv (bool): Whether this is a TV show
+        use_cache (bool): Serve and store results through the on-disk title cache
+        cache (TitleCache): Cache to use instead of the shared default
+        session (requests.Session): Pooled session to reuse connections
+    Returns:
+        str: Formatted title with year or None if not found
+    """
+    search_title = normalize_search_title(colloquial_title, is_tv)
+    media_type = 'series' if is_tv else 'movie'
+
+    if use_cache:
+        cache = cache or get_default_cache()
+        hit, proper_title = cache.get(cache_key(search_title), media_type)
+        if hit:
+            logging.info(f"Title cache hit for {search_title}: {proper_title}")
+            return proper_title
+
+    api_key = get_api_key()
+
+    if not api_key:
+        logging.error("OMDB_API_KEY not found in environment variables")
+        return None
 
     logging.info(f"Searching OMDB for title: {search_title}")
-    
-    # Prepare the API request
-    url = f"http://www.omdbapi.com/?t={search_title}&type={'series' if is_tv else 'movie'}&apikey={api_key}"
-    
-    try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        
-        logging.info(f"OMDB response: {data}")
-        
-        if data.get('Response') == 'True':
-            title = data.get('Title')
-            year = data.get('Year', '').split('–')[0]  # Get first year for TV series
-            return f"{title} ({year})"
+    proper_title, cacheable = query_omdb(search_title, media_type, api_key, session)
+
+    if use_cache and cacheable:
+        cache.put(cache_key(search_title), media_type, proper_title)
+    return proper_title
+
+@spans.timed()
+def resolve_titles(queries, max_workers=DEFAULT_WORKERS, rate_limit=DEFAULT_RATE_LIMIT,
+                   timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                   use_cache=True, cache=None):
+    """
+    Resolve many titles at once, deduplicating them and querying OMDb concurrently
+    Args:
+        queries (iterable): (colloquial_title, is_tv) pairs, duplicates allowed
+        max_workers (int): Concurrent requests (also the connection pool size)
+        rate_limit (float): Maximum requests started per second, 0 for no limit
+        timeout (float): Per-request timeout in seconds
+        retries (int): Extra attempts for transient failures
+        backoff (float): Initial retry delay in seconds
+        use_cache (bool): Serve and store results through the title cache
+        cache (TitleCache): Cache to use instead of the shared default
+    Returns:
+        dict: {(colloquial_title, is_tv): proper_title or None}
+    """
+    if use_cache:
+        cache = cache or get_default_cache()
+
+    # Many episodes share one show lookup; group queries by what we would actually send
+    groups = {}
+    for colloquial_title, is_tv in queries:
+        search_title = normalize_search_title(colloquial_title, is_tv)
+        key = (cache_key(search_title), 'series' if is_tv else 'movie')
+        groups.setdefault(key, (search_title, set()))[1].add((colloquial_title, is_tv))
+
+    resolved = {}
+    pending = []
+    for key, (search_title, members) in groups.items():
+        hit, proper_title = cache.get(*key) if use_cache else (False, None)
+        if hit:
+            resolved[key] = proper_title
         else:
-            logging.error(f"Title not found in OMDB: {search_title}")
-            logging.error(f"OMDB error message: {data.get('Error')}")
-            return None
-            
-    except requests.RequestException as e:
-        logging.error(f"Error fetching data from OMDb: {e}")
-        return None
+            pending.append((key, search_title))
+
+    if pending:
+        api_key = get_api_key()
+        if not api_key:
+            logging.error("OMDB_API_KEY not found in environment variables")
+        else:
+            logging.info(f"Resolving {len(pending)} title(s) from OMDb "
+                         f"({len(groups) - len(pending)} cached)")
+            rate_limiter = RateLimiter(rate_limit)
+            with create_session(max_workers) as session, concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix='omdb'
+            ) as executor:
+                futures = {
+                    executor.submit(query_omdb, search_title, key[1], api_key, session,
+                                    timeout, retries, backoff, rate_limiter): key
+                    for key, search_title in pending
+                }
+                for future in concurrent.futures.as_completed(futures):
+                    key = futures[future]
+                    proper_title, cacheable = future.result()
+                    resolved[key] = proper_title
+                    if use_cache and cacheable:
+                        cache.put(*key, proper_title)
+
+    return {
+        query: resolved.get(key)
+        for key, (_, members) in groups.items()
+        for query in members
+    }
+
+def print_cache(cache):
+    """Print every cached lookup with its age"""
+    rows = cache.entries()
+    if not rows:
+        print("Title cache is empty")
+        return
+
+    now = time.time()
+    for search_title, media_type, proper_title, fetched_at in rows:
+        age_days = (now - fetched_at) / 86400
+        print(f"{search_title!r} [{media_type}] -> {proper_title or 'NOT FOUND'} "
+              f"({age_days:.1f} days old)")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Look up the proper title of a movie or TV show")
+    parser.add_argument('title', nargs='?', help="Colloquial title to look up")
+    media_group = parser.add_mutually_exclusive_group()
+    media_group.add_argument('--tv', action='store_true', help="Look up a TV series")
+    media_group.add_argument('--movie', action='store_true', help="Look up a movie (default)")
+    parser.add_argument('--no-cache', action='store_true', help="Bypass the title cache")
+    parser.add_argument('--cache-list', action='store_true', help="Show cached lookups")
+    parser.add_argument('--cache-clear', action='store_true',
+                        help="Clear the cached entry for TITLE, or the whole cache without a title")
+    args = parser.parse_args()
+
+    if args.cache_list:
+        print_cache(get_default_cache())
+        sys.exit(0)
+
+    if args.cache_clear:
+        media_type = 'series' if args.tv else 'movie' if args.movie else None
+        search_title = cache_key(normalize_search_title(args.title, args.tv)) if args.title else None
+        removed = get_default_cache().clear(search_title, media_type)
+        print(f"Removed {removed} cached title(s)")
+        sys.exit(0)
+
     # Check if movie title was provided as argument
-    if len(sys.argv) < 2:
-        print("Usage: python3 title.py \"movie title\"")
+    if not args.title:
+        print("Usage: python3 title.py \"movie title\" [--tv|--movie]")
         sys.exit(1)
-        
-    # Get movie title from command line argument
-    title = sys.argv[1]
-    proper_title = get_proper_title(title)
+
+    proper_title = get_proper_title(args.title, args.tv, use_cache=not args.no_cache)
     if proper_title:
         print(proper_title)
     else:
@@ -1,6 +1,23 @@
 import subprocess
 import logging
+from scripts import process, spans
 
+# More black sections than this (each >1s) fails the video check
+MAX_BLACK_SECTIONS = 5
+
+BLACKDETECT_FILTER = 'blackdetect=d=1:pix_th=0.00'
+
+def count_black_sections(ffmpeg_stderr):
+    """
+    Count the black sections reported by ffmpeg's blackdetect filter
+    Args:
+        ffmpeg_stderr (str): stderr captured from an ffmpeg run using blackdetect
+    Returns:
+        int: Number of black sections found
+    """
+    return ffmpeg_stderr.count("black_start")
+
+@spans.timed()
 def check_video_stream(file_path):
     """
     Check if video file has valid video stream and is not all black
@@ -8,6 +25,8 @@ def check_video_stream(file_path):
         file_path (str): Path to video file
     Returns:
         bool: True if video stream is valid, False otherwise
+    Raises:
+        ProcessKilled: A tool was killed by its time limit or an interrupt
     """
     try:
         # Check video stream presence
@@ -20,7 +39,7 @@ def check_video_stream(file_path):
             str(file_path)
         ]
         
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result = process.run_tool(cmd, 'probe')
         if result.returncode != 0:
             logging.error(f"FFprobe error: {result.stderr}")
             return False
@@ -29,24 +48,27 @@ def check_video_stream(file_path):
         cmd_black = [
             'ffmpeg',
             '-i', str(file_path),
-            '-vf', 'blackdetect=d=1:pix_th=0.00',
+            '-vf', BLACKDETECT_FILTER,
             '-an',
             '-f', 'null',
             '-'
         ]
         
-        result_black = subprocess.run(cmd_black, capture_output=True, text=True)
+        result_black = process.run_tool(cmd_black, 'qc')
         
         # If there's a long black section (>1s), log it
-        if "black_start" in result_black.stderr:
+        black_sections = count_black_sections(result_black.stderr)
+        if black_sections:
             logging.warning(f"Black frames detected in {file_path}")
             # You might want to adjust this threshold based on your needs
-            if result_black.stderr.count("black_start") > 5:
+            if black_sections > MAX_BLACK_SECTIONS:
                 logging.error(f"Too many black sections in {file_path}")
                 return False
                 
         return True
         
+    except process.ProcessKilled:
+        raise
     except subprocess.SubprocessError as e:
         logging.error(f"Error checking video stream: {e}")
         return False 
\ No newline at end of file
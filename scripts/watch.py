@@ -0,0 +1,201 @@
+import os
+import sys
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+import threading
+from scripts import scan
+
+# inotify event masks from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct('iIII')
+
+class InotifyWatcher:
+    """Recursive inotify watch on a directory tree (Linux only)"""
+
+    def __init__(self, root):
+        self.root = str(root)
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._dirs = {}
+        self.add_tree(self.root)
+
+    def add_tree(self, dir_path):
+        """Watch a directory and everything below it, returning media files already inside"""
+        found = []
+        for current, subdirs, files in os.walk(dir_path):
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(current), WATCH_MASK)
+            if wd < 0:
+                logging.warning(f"Could not watch {current}: {os.strerror(ctypes.get_errno())}")
+                continue
+            self._dirs[wd] = current
+            found.extend(os.path.join(current, name) for name in files if scan.is_media_file(name))
+        return found
+
+    def read_events(self, timeout):
+        """
+        Wait up to timeout seconds for filesystem activity
+        Returns: (changed_media_paths, needs_rescan)
+        """
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return [], False
+
+        data = os.read(self._fd, 64 * 1024)
+        paths, needs_rescan = [], False
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_len = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + name_len].rstrip(b'\0'))
+            offset += name_len
+
+            if mask & IN_Q_OVERFLOW:
+                # The kernel dropped events; only a rescan can tell what changed
+                needs_rescan = True
+                continue
+            if mask & IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+
+            parent = self._dirs.get(wd)
+            if parent is None or not name:
+                continue
+            path = os.path.join(parent, name)
+
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    paths.extend(self.add_tree(path))
+            elif scan.is_media_file(name):
+                paths.append(path)
+
+        return paths, needs_rescan
+
+    def close(self):
+        os.close(self._fd)
+
+class PollingWatcher:
+    """Fallback watcher that asks for a rescan every poll interval"""
+
+    def __init__(self, root):
+        self.root = str(root)
+
+    def read_events(self, timeout):
+        time.sleep(timeout)
+        return [], True
+
+    def close(self):
+        pass
+
+def create_watcher(root, use_inotify=True):
+    """Use inotify where available, otherwise fall back to polling"""
+    if use_inotify and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError) as e:
+            logging.warning(f"inotify unavailable ({e}), falling back to polling")
+    return PollingWatcher(root)
+
+class StabilityTracker:
+    """
+    Tracks candidate files until their size and mtime stop changing.
+    The number of tracked files is capped; anything dropped is picked up
+    again by the next rescan.
+    """
+
+    def __init__(self, stable_seconds=30, max_pending=10000):
+        self.stable_seconds = stable_seconds
+        self.max_pending = max_pending
+        self._pending = {}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, path):
+        if path in self._pending or len(self._pending) >= self.max_pending:
+            return
+        self._pending[path] = (None, None, time.monotonic())
+
+    def pop_stable(self):
+        """Return files that have not changed for stable_seconds and stop tracking them"""
+        now = time.monotonic()
+        stable = []
+        for path, (size, mtime_ns, since) in list(self._pending.items()):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                del self._pending[path]
+                continue
+
+            if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+                self._pending[path] = (stat.st_size, stat.st_mtime_ns, now)
+            elif stat.st_size > 0 and now - since >= self.stable_seconds:
+                del self._pending[path]
+                stable.append(path)
+        return stable
+
+def watch_for_stable_files(source_dir, on_stable, stop_event, stable_seconds=30,
+                           poll_interval=5, rescan_interval=600, max_pending=10000,
+                           use_inotify=True, scan_index=None):
+    """
+    Call on_stable(path) for every media file under source_dir once it stops growing
+    Args:
+        source_dir (str): Directory to watch
+        on_stable (callable): Called from this thread with each stable file path
+        stop_event (threading.Event): Set to make the loop return
+        stable_seconds (float): How long size/mtime must stay unchanged
+        poll_interval (float): Seconds between stability checks
+        rescan_interval (float): Seconds between safety rescans of the whole tree
+        max_pending (int): Cap on files tracked at once
+        use_inotify (bool): Try inotify before falling back to polling
+        scan_index (scan.ScanIndex): Optional index that keeps rescans cheap
+    """
+    tracker = StabilityTracker(stable_seconds, max_pending)
+    watcher = create_watcher(source_dir, use_inotify)
+    logging.info(f"Watching {source_dir} with {type(watcher).__name__}")
+
+    needs_rescan = True
+    last_rescan = 0.0
+    try:
+        while not stop_event.is_set():
+            if needs_rescan or time.monotonic() - last_rescan >= rescan_interval:
+                for entry in scan.iter_media_files(source_dir, scan_index):
+                    tracker.add(entry.path)
+                last_rescan = time.monotonic()
+
+            for path in tracker.pop_stable():
+                if stop_event.is_set():
+                    break
+                on_stable(path)
+
+            paths, needs_rescan = watcher.read_events(poll_interval)
+            for path in paths:
+                tracker.add(path)
+    finally:
+        watcher.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python3 -m scripts.watch <directory>")
+        sys.exit(1)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(message)s')
+    stop = threading.Event()
+    try:
+        watch_for_stable_files(sys.argv[1], lambda path: print(f"Stable: {path}"), stop,
+                               stable_seconds=5, poll_interval=1)
+    except KeyboardInterrupt:
+        stop.set()
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Tests import main.py and the scripts package from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
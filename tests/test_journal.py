@@ -0,0 +1,66 @@
+import os
+import pickle
+import pytest
+from scripts.journal import JobJournal
+
+@pytest.fixture
+def journal(tmp_path):
+    job_journal = JobJournal(tmp_path / 'jobs.db')
+    yield job_journal
+    job_journal.close()
+
+def write(path, data):
+    path.write_bytes(data)
+    stat = path.stat()
+    return stat.st_size, stat.st_mtime_ns
+
+def test_unchanged_source_keeps_its_job(tmp_path, journal):
+    source = tmp_path / 'S01E01.mkv'
+    size, mtime_ns = write(source, b'episode')
+    job = journal.discover(source, size, mtime_ns)
+    journal.advance(job, 'moved')
+
+    again = journal.discover(source, size, mtime_ns)
+    assert again.id == job.id and again.reached('moved')
+
+def test_replaced_source_starts_over(tmp_path, journal):
+    source = tmp_path / 'S01E01.mkv'
+    job = journal.discover(source, *write(source, b'old release'))
+    journal.set_fingerprint(job, 'old')
+    journal.advance(job, 'moved')
+
+    size, mtime_ns = write(source, b're-downloaded release')
+    os.utime(source, ns=(mtime_ns + 10**9, mtime_ns + 10**9))
+    again = journal.discover(source, size, mtime_ns + 10**9, fingerprint=lambda: 'new')
+    assert again.id == job.id
+    assert again.stage == 'discovered' and again.fingerprint is None
+    assert journal.find(source).stage == 'discovered'
+
+def test_touched_source_with_same_content_keeps_its_job(tmp_path, journal):
+    source = tmp_path / 'S01E01.mkv'
+    size, mtime_ns = write(source, b'episode')
+    job = journal.discover(source, size, mtime_ns)
+    journal.set_fingerprint(job, 'same')
+    journal.advance(job, 'moved')
+
+    again = journal.discover(source, size, mtime_ns + 1, fingerprint=lambda: 'same')
+    assert again.reached('moved')
+
+def test_rows_without_sizes_are_adopted_unless_their_source_was_moved(tmp_path, journal):
+    pending, finished = tmp_path / 'pending.mkv', tmp_path / 'finished.mkv'
+    pending_job, finished_job = journal.discover(pending), journal.discover(finished)
+    journal.advance(pending_job, 'renamed')
+    journal.advance(finished_job, 'moved')
+
+    assert journal.discover(pending, *write(pending, b'a')).stage == 'renamed'
+    # The pipeline deletes the sources it moves, so this file arrived afterwards
+    assert journal.discover(finished, *write(finished, b'b')).stage == 'discovered'
+
+def test_pickle_is_imported_once_and_left_in_place(tmp_path, journal):
+    progress_path = tmp_path / '.progress.pkl'
+    progress_path.write_bytes(pickle.dumps({'/media/source/film.mp4'}))
+
+    assert journal.migrate_pickle(progress_path) == 1
+    assert journal.migrate_pickle(progress_path) == 0
+    assert progress_path.exists()
+    assert journal.find('/media/source/film.mp4').reached('moved')
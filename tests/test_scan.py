@@ -0,0 +1,41 @@
+import os
+import time
+import pytest
+from scripts import scan
+
+@pytest.fixture
+def index(tmp_path):
+    scan_index = scan.ScanIndex(tmp_path / 'scan_index.db')
+    yield scan_index
+    scan_index.close()
+
+def names(source, index):
+    return sorted(os.path.basename(entry.path) for entry in scan.iter_media_files(source, index))
+
+def set_mtime(path, mtime_ns):
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+def test_listing_taken_in_the_directory_mtime_tick_is_not_reused(tmp_path, index):
+    source = tmp_path / 'source'
+    source.mkdir()
+    (source / 'a.mkv').write_bytes(b'a')
+    mtime_ns = source.stat().st_mtime_ns
+    assert names(source, index) == ['a.mkv']
+
+    # A file created in the same coarse timestamp tick leaves the mtime unchanged
+    (source / 'b.mkv').write_bytes(b'b')
+    set_mtime(source, mtime_ns)
+    assert names(source, index) == ['a.mkv', 'b.mkv']
+
+def test_listing_taken_well_after_the_directory_mtime_is_reused(tmp_path, index):
+    source = tmp_path / 'source'
+    source.mkdir()
+    (source / 'a.mkv').write_bytes(b'a')
+    old_ns = time.time_ns() - 10 * scan.RACY_NS
+    set_mtime(source, old_ns)
+    assert names(source, index) == ['a.mkv']
+
+    # Not visible: the directory looks unchanged and its listing is trusted
+    (source / 'b.mkv').write_bytes(b'b')
+    set_mtime(source, old_ns)
+    assert names(source, index) == ['a.mkv']
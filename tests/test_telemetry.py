@@ -0,0 +1,18 @@
+from scripts import telemetry
+from scripts.jobs import Job
+
+def test_stats_without_a_store_creates_nothing(tmp_path, capsys):
+    db_path = tmp_path / 'telemetry.db'
+    telemetry.show_stats(db_path)
+
+    assert 'No telemetry recorded' in capsys.readouterr().out
+    assert list(tmp_path.iterdir()) == []
+
+def test_stats_read_an_existing_store(tmp_path, capsys):
+    db_path = tmp_path / 'telemetry.db'
+    store = telemetry.TelemetryStore(db_path)
+    store.record(Job(1, tmp_path / 'film.mkv'), output_bytes=1000)
+    store.close()
+
+    telemetry.show_stats(db_path)
+    assert 'Jobs finished:       1' in capsys.readouterr().out
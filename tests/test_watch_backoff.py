@@ -0,0 +1,59 @@
+import os
+import time
+import pytest
+import main
+from scripts.journal import JobJournal
+
+CONFIG = {'watch_retry_seconds': 600, 'watch_retry_max_seconds': 3600}
+
+@pytest.fixture
+def journal(tmp_path):
+    job_journal = JobJournal(tmp_path / 'jobs.db')
+    yield job_journal
+    job_journal.close()
+
+@pytest.fixture
+def job(tmp_path, journal):
+    source = tmp_path / 'film.mkv'
+    source.write_bytes(b'broken')
+    return journal.discover(source)
+
+def test_new_job_is_not_held_back(job, journal):
+    assert not main.in_retry_backoff(job, CONFIG, journal)
+
+def test_failed_job_waits_until_backoff_expires(job, journal):
+    journal.record_error(job, 'transcode failed')
+    failed_at = journal.last_failure(job).failed_at
+
+    assert main.in_retry_backoff(job, CONFIG, journal)
+    assert main.in_retry_backoff(job, CONFIG, journal, now=failed_at + 599)
+    assert not main.in_retry_backoff(job, CONFIG, journal, now=failed_at + 600)
+
+def test_backoff_doubles_with_each_failure_up_to_the_cap(job, journal):
+    for _ in range(2):
+        journal.record_error(job, 'transcode failed')
+    failed_at = journal.last_failure(job).failed_at
+    assert main.in_retry_backoff(job, CONFIG, journal, now=failed_at + 1199)
+    assert not main.in_retry_backoff(job, CONFIG, journal, now=failed_at + 1200)
+
+    for _ in range(5):
+        journal.record_error(job, 'transcode failed')
+    failed_at = journal.last_failure(job).failed_at
+    assert journal.last_failure(job).failures == 7
+    assert not main.in_retry_backoff(job, CONFIG, journal, now=failed_at + 3600)
+
+def test_changed_source_is_retried_at_once(job, journal):
+    journal.record_error(job, 'transcode failed')
+    later = time.time() + 60
+    os.utime(job.current_path, (later, later))
+
+    assert not main.in_retry_backoff(job, CONFIG, journal)
+
+def test_interrupted_and_recovered_jobs_are_not_held_back(job, journal):
+    journal.record_error(job, 'transcode interrupted', status='interrupted')
+    assert not main.in_retry_backoff(job, CONFIG, journal)
+
+    journal.record_error(job, 'transcode failed')
+    journal.advance(job, 'renamed')
+    assert journal.last_failure(job) is None
+    assert not main.in_retry_backoff(job, CONFIG, journal)